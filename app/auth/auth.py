@@ -1,9 +1,20 @@
+from typing import Optional
+
 from fastapi import Request, HTTPException, Depends
 import jwt
 from app.settings import SECRET_KEY, ALGORITHM
 from app.lib.sql import verif_session, is_admin
 
 
+def get_token_user_id(request: Request) -> Optional[int]:
+    """Member id of the access token once its signature is checked, without the session lookup; None when the
+    token is missing or invalid."""
+    try:
+        return int(jwt.decode(request.cookies.get("access_token"), SECRET_KEY, algorithms=[ALGORITHM])["user_id"])
+    except Exception:
+        return None
+
+
 async def get_current_user(request: Request):
     try:
         access_token = request.cookies.get("access_token")
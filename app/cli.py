@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+
+from app.lib.importer import IMPORT_FORMATS, import_members
+from app.lib.pools import pools
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import-members", help="bulk import members from a CSV or NDJSON file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--validate", action="store_true", help="validate the imported members right away")
+    args = parser.parse_args()
+
+    if args.command == "import-members":
+        if not args.path.lower().endswith(IMPORT_FORMATS):
+            parser.error("the file must be one of: {}".format(", ".join(IMPORT_FORMATS)))
+        pools.open()
+        with open(args.path, "rb") as file:
+            report = asyncio.run(import_members(file, args.path, args.validate))
+        for error in report.errors:
+            print("line {}: {} ({})".format(error.line, error.detail, error.username))
+        print("{} member(s) created, {} row(s) rejected".format(report.created, len(report.errors)))
+
+
+if __name__ == "__main__":
+    main()
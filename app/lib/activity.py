@@ -0,0 +1,31 @@
+import re
+
+from starlette.requests import Request
+
+from app.lib.articles import article_views
+from app.lib.counters import CounterBuffer
+from app.lib.middleware import ARTICLE_PATH
+from app.lib.sql import IMAGE_VIEW, PROFILE_VIEW, flush_member_activity
+
+PROFILE_PATH = re.compile(r"^/member/(\d+)$")
+
+member_activity = CounterBuffer("member activity", flush_member_activity)
+
+
+def count_profile_view(id_member: int) -> None:
+    member_activity.add((id_member, PROFILE_VIEW))
+
+
+def count_image_view(id_member: int) -> None:
+    member_activity.add((id_member, IMAGE_VIEW))
+
+
+def count_not_modified_view(request: Request) -> None:
+    """Count the view of a profile, image or article answered with a 304, before the endpoint that counts it ran."""
+    path = request.url.path
+    if PROFILE_PATH.match(path):
+        count_profile_view(int(PROFILE_PATH.match(path).group(1)))
+    elif path == "/member/image_portfolio_by_id" and request.query_params.get("id_member", "").isdigit():
+        count_image_view(int(request.query_params["id_member"]))
+    elif ARTICLE_PATH.match(path):
+        article_views.add(int(ARTICLE_PATH.match(path).group(1)))
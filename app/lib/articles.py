@@ -0,0 +1,32 @@
+import html
+from datetime import datetime
+from typing import Optional, Tuple
+
+from app.lib.counters import CounterBuffer
+from app.lib.sql import flush_article_views
+from app.models import Article, ArticleSummary
+
+FEED_DEFAULT_LIMIT = 20
+FEED_MAX_LIMIT = 100
+
+article_views = CounterBuffer("article views", flush_article_views)
+
+
+def encode_feed_cursor(article: ArticleSummary) -> str:
+    return "{}_{}".format(article.date_published.isoformat(), article.id)
+
+
+def decode_feed_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    date_published, _, id_article = cursor.rpartition("_")
+    try:
+        return datetime.fromisoformat(date_published), int(id_article)
+    except ValueError:
+        return None
+
+
+def render_article_html(article: Article) -> str:
+    """Articles are stored as plain text: blank lines separate paragraphs and single newlines are kept."""
+    paragraphs = [paragraph.strip() for paragraph in article.content.replace("\r\n", "\n").split("\n\n")]
+    body = "".join("<p>{}</p>".format(html.escape(paragraph).replace("\n", "<br>"))
+                   for paragraph in paragraphs if paragraph)
+    return "<article><h1>{}</h1>{}</article>".format(html.escape(article.title), body)
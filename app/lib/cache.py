@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
+
+from app import settings
+
+
+@dataclass
+class EncodedBody:
+    version: Hashable
+    items: Any
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    media_type: str = "application/json"
+
+
+def body_etag(body: bytes) -> str:
+    """Weak ETag derived from the content alone, so every worker (and a restarted one) tags the same body alike."""
+    return 'W/"{}"'.format(hashlib.sha1(body).hexdigest()[:20])
+
+
+class DataVersions:
+    """Monotonic version stamps of the data sets served by the API, bumped by the sql writers."""
+
+    def __init__(self):
+        self.versions: Dict[str, int] = {}
+        self.floor = 0
+
+    def get(self, key: str) -> int:
+        return self.versions.get(key, self.floor)
+
+    def bump(self, key: str) -> int:
+        self.versions[key] = self.get(key) + 1
+        return self.versions[key]
+
+    def expire(self) -> None:
+        """Move every version, bumped or not, past all the values handed out so far."""
+        self.floor = max([self.floor] + list(self.versions.values())) + 1
+        self.versions = {}
+
+
+class ResponseCache:
+    """Already encoded JSON (and gzip) bodies, valid as long as their version is current. With ``max_entries`` the
+    least recently used entries are dropped once the cache is full."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, EncodedBody]" = OrderedDict()
+        self.evicted = 0
+
+    def get(self, key: str, version: Hashable) -> Optional[EncodedBody]:
+        entry = self.entries.get(key)
+        if entry is None or entry.version != version:
+            return None
+        if self.max_entries is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, version: Hashable, items: List[BaseModel]) -> EncodedBody:
+        body = json.dumps([item.dict() for item in items], default=pydantic_encoder, separators=(",", ":")).encode()
+        return self.put_body(key, version, items, body)
+
+    def put_body(self, key: str, version: Hashable, items: Any, body: bytes,
+                 media_type: str = "application/json") -> EncodedBody:
+        entry = EncodedBody(version=version, items=items, body=body, gzip_body=gzip.compress(body, compresslevel=6),
+                            etag=body_etag(body), media_type=media_type)
+        self.entries[key] = entry
+        if self.max_entries is not None:
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evicted += 1
+        return entry
+
+    def evict(self, key: str) -> None:
+        self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "evicted": self.evicted}
+
+
+class StoredVersions:
+    """Versions kept in the database, hence the same in every worker, cached until a change event drops them. A read
+    that started before an eviction is not stored since it may predate the change."""
+
+    def __init__(self):
+        self.versions: Dict[int, int] = {}
+        self.evictions = 0
+
+    def get(self, key: int) -> Optional[int]:
+        return self.versions.get(key)
+
+    def put(self, key: int, version: int, evictions: int) -> None:
+        if evictions == self.evictions:
+            self.versions[key] = version
+
+    def evict(self, key: int) -> None:
+        self.versions.pop(key, None)
+        self.evictions += 1
+
+    def clear(self) -> None:
+        self.versions = {}
+        self.evictions += 1
+
+
+versions = DataVersions()
+member_versions = StoredVersions()
+response_cache = ResponseCache()
+# One entry per article and representation, so bounded unlike the handful of list endpoints above
+article_cache = ResponseCache(settings.ARTICLE_CACHE_SIZE)
+
+
+async def cached_list(key: str, version: Hashable, load: Callable[[], Awaitable[List[BaseModel]]]) -> EncodedBody:
+    entry = response_cache.get(key, version)
+    if entry is None:
+        entry = response_cache.put(key, version, await load())
+    return entry
+
+
+def encoded_response(entry: EncodedBody, request: Request) -> Response:
+    headers = {"Vary": "Accept-Encoding", "ETag": entry.etag}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry.gzip_body, media_type=entry.media_type, headers=headers)
+    return Response(content=entry.body, media_type=entry.media_type, headers=headers)
@@ -0,0 +1,37 @@
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, DefaultDict, Dict, Hashable
+
+
+class CounterBuffer:
+    """Collects increments in memory and writes them in one batch per flush instead of one UPDATE per hit."""
+
+    def __init__(self, name: str, flush: Callable[[Dict[Hashable, int]], Awaitable[None]]):
+        self.name = name
+        self._flush = flush
+        self.counts: DefaultDict[Hashable, int] = defaultdict(int)
+        self.flushed = 0
+
+    def add(self, key: Hashable, amount: int = 1) -> None:
+        self.counts[key] += amount
+
+    def pending(self) -> int:
+        return len(self.counts)
+
+    async def flush(self) -> None:
+        if not self.counts:
+            return None
+        counts, self.counts = self.counts, defaultdict(int)
+        try:
+            await self._flush(dict(counts))
+        except Exception as e:
+            print(f"Flushing {self.name} counters failed, keeping them for the next flush: {e}")
+            for key, amount in counts.items():
+                self.counts[key] += amount
+            return None
+        self.flushed += len(counts)
+
+    async def run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
@@ -0,0 +1,46 @@
+import asyncio
+from functools import partial
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+async def run_blocking(function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking mysql-connector call in the default executor so the event loop keeps serving requests."""
+    return await asyncio.get_running_loop().run_in_executor(None, partial(function, *args, **kwargs))
+
+
+class AsyncCursor:
+    """Awaitable wrapper of a buffered mysql-connector cursor: statements run in the executor, the rows are then read
+    from the buffer."""
+
+    def __init__(self, cursor: Any):
+        self.cursor = cursor
+        self.events: List[Tuple[str, Optional[int]]] = []
+
+    def publish(self, topic: str, key: Optional[int] = None) -> None:
+        """Queue a change event: it is written with this transaction and dispatched once the transaction commits."""
+        self.events.append((topic, key))
+
+    async def execute(self, operation: str, params: Any = ()) -> None:
+        await run_blocking(self.cursor.execute, operation, params)
+
+    async def execute_multi(self, operation: str, params: Any = ()) -> List[Optional[List[Sequence[Any]]]]:
+        """Run several statements in one round-trip and return the rows of each, None for those without rows."""
+        def execute() -> List[Optional[List[Sequence[Any]]]]:
+            return [result.fetchall() if result.with_rows else None
+                    for result in self.cursor.execute(operation, params, multi=True)]
+        return await run_blocking(execute)
+
+    async def fetchone(self) -> Optional[Sequence[Any]]:
+        return self.cursor.fetchone()
+
+    async def fetchall(self) -> List[Sequence[Any]]:
+        return self.cursor.fetchall()
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self.cursor.lastrowid
+
+    def close(self) -> None:
+        self.cursor.close()
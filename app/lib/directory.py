@@ -0,0 +1,46 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from app.models import MemberWithCategory
+
+
+class DirectorySnapshot:
+    """Denormalized, in-memory copy of the public member directory (validated and not banned members).
+
+    Loads and per-member refreshes run under ``lock`` so that they apply in the order they read the database."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.members: Dict[int, MemberWithCategory] = {}
+        self.loaded = False
+        self.version = 0
+        self._ordered: Optional[List[MemberWithCategory]] = None
+
+    def load(self, members: Iterable[MemberWithCategory]) -> None:
+        self.members = {member.id_member: member for member in members}
+        self.loaded = True
+        self._changed()
+
+    def upsert(self, member: MemberWithCategory) -> None:
+        self.members[member.id_member] = member
+        self._changed()
+
+    def remove(self, id_member: int) -> None:
+        if self.members.pop(id_member, None) is not None:
+            self._changed()
+
+    def invalidate(self) -> None:
+        self.loaded = False
+        self._changed()
+
+    def list(self) -> List[MemberWithCategory]:
+        if self._ordered is None:
+            self._ordered = [self.members[id_member] for id_member in sorted(self.members)]
+        return self._ordered
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._ordered = None
+
+
+directory = DirectorySnapshot()
@@ -0,0 +1,116 @@
+import asyncio
+import secrets
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, DefaultDict, Dict, List, Optional
+
+Handler = Callable[[Optional[int]], Awaitable[None]]
+
+
+@dataclass
+class ChangeEvent:
+    topic: str
+    key: Optional[int]
+    origin: str
+
+
+class LocalTransport:
+    """In-process stand-in: events only reach the worker that published them."""
+
+    outbox = False
+
+    async def poll(self) -> List[ChangeEvent]:
+        return []
+
+
+class OutboxTransport:
+    """Events are written to the ``change_event`` table by the transaction of the change itself, and every worker
+    polls the table past its cursor.
+
+    Auto-increment ids are allocated on insert but become visible on commit, so a lower id can appear after a higher
+    one. The ids the cursor skips over are re-read until they show up or ``gap_timeout`` expires, since the id of a
+    rolled back insert is never used.
+    """
+
+    outbox = True
+
+    def __init__(self, fetch: Callable[[Optional[int]], Awaitable[List[tuple]]],
+                 fetch_range: Callable[[int, int], Awaitable[List[tuple]]],
+                 prune: Callable[[], Awaitable[None]], prune_every: int = 3600, gap_timeout: float = 60,
+                 max_gap: int = 1000):
+        self.fetch = fetch
+        self.fetch_range = fetch_range
+        self.prune = prune
+        self.prune_every = prune_every
+        self.gap_timeout = gap_timeout
+        self.max_gap = max_gap
+        self.cursor: Optional[int] = None
+        self.gaps: Dict[int, float] = {}
+        self.polls = 0
+
+    async def poll(self) -> List[ChangeEvent]:
+        self.polls += 1
+        if self.polls % self.prune_every == 0:
+            await self.prune()
+        now = time.monotonic()
+        self.gaps = {id_event: since for id_event, since in self.gaps.items() if now - since < self.gap_timeout}
+        late = []
+        if self.gaps:
+            late = [row for row in await self.fetch_range(min(self.gaps), max(self.gaps)) if row[0] in self.gaps]
+        rows = await self.fetch(self.cursor)
+        events = []
+        for id_event, topic, key, origin in late:
+            del self.gaps[id_event]
+            events.append(ChangeEvent(topic=topic, key=key, origin=origin))
+        for id_event, topic, key, origin in rows:
+            if self.cursor is not None:
+                for missing in range(max(self.cursor + 1, id_event - self.max_gap), id_event):
+                    self.gaps[missing] = now
+            self.cursor = id_event if self.cursor is None else max(self.cursor, id_event)
+            if topic is not None:
+                events.append(ChangeEvent(topic=topic, key=key, origin=origin))
+        return events
+
+
+class ChangeBus:
+    """Change events of the sql writers.
+
+    A writer queues its events on the statement or cursor of its transaction. Once the transaction has committed
+    the handlers run right away in the publishing worker, and the outbox transport carries the events to the other
+    workers, which run the same handlers when they poll them.
+    """
+
+    def __init__(self):
+        self.origin = secrets.token_hex(8)
+        self.handlers: DefaultDict[str, List[Handler]] = defaultdict(list)
+        self.transport = LocalTransport()
+
+    def use(self, transport) -> None:
+        self.transport = transport
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self.handlers[topic].append(handler)
+
+    def event(self, topic: str, key: Optional[int] = None) -> ChangeEvent:
+        return ChangeEvent(topic=topic, key=key, origin=self.origin)
+
+    async def dispatch(self, event: ChangeEvent) -> None:
+        for handler in self.handlers[event.topic]:
+            try:
+                await handler(event.key)
+            except Exception as e:
+                print(f"Change event handler failed for {event.topic}:{event.key}: {e}")
+
+    async def run(self, interval: float) -> None:
+        while True:
+            try:
+                for event in await self.transport.poll():
+                    if event.origin != self.origin:
+                        await self.dispatch(event)
+            except Exception as e:
+                print(f"Change event poll failed: {e}")
+            await asyncio.sleep(interval)
+
+
+changes = ChangeBus()
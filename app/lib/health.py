@@ -0,0 +1,42 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app import settings
+from app.lib.sql import ping_database
+
+
+class CachedProbe:
+    """Runs ``check`` at most once every ``ttl`` seconds; callers arriving meanwhile get the last result, so a burst
+    of readiness checks costs a single database round-trip."""
+
+    def __init__(self, check: Callable[[], Awaitable[None]], ttl: float):
+        self._check = check
+        self.ttl = ttl
+        self._lock = asyncio.Lock()
+        self.healthy = False
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+
+    def fresh(self) -> bool:
+        return self.checked_at is not None and time.monotonic() - self.checked_at < self.ttl
+
+    async def ok(self) -> bool:
+        if self.fresh():
+            return self.healthy
+        async with self._lock:
+            if not self.fresh():
+                try:
+                    await self._check()
+                    self.healthy, self.error = True, None
+                except Exception as e:
+                    self.healthy, self.error = False, str(e)
+                self.checked_at = time.monotonic()
+        return self.healthy
+
+    def stats(self) -> Dict[str, Any]:
+        age = None if self.checked_at is None else round(time.monotonic() - self.checked_at, 3)
+        return {"healthy": self.healthy, "error": self.error, "age": age}
+
+
+database_probe = CachedProbe(ping_database, settings.READY_PROBE_TTL)
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.lib.sql import find_lookup_id, get_category_lookup, get_network_lookup, insert_member_chunk, \
+    load_categories, load_networks
+from app.models import ImportReport, ImportRowError, MemberImport
+
+IMPORT_FORMATS = (".csv", ".ndjson", ".jsonl")
+IMPORT_CHUNK_SIZE = 200
+CSV_LIST_SEPARATOR = "|"
+CSV_NETWORK_PREFIX = "network:"
+
+
+def csv_row_to_record(row: Dict[str, str]) -> dict:
+    """CSV columns: the member fields, ``categories`` as a "|" separated list and one ``network:<name>`` column
+    per network holding the url."""
+    record = {key: value or None for key, value in row.items()
+              if key and key != "categories" and not key.startswith(CSV_NETWORK_PREFIX)}
+    record["categories"] = [name.strip() for name in (row.get("categories") or "").split(CSV_LIST_SEPARATOR)
+                            if name.strip()]
+    record["networks"] = {key[len(CSV_NETWORK_PREFIX):]: value for key, value in row.items()
+                          if key and key.startswith(CSV_NETWORK_PREFIX) and value}
+    return record
+
+
+def read_records(file: BinaryIO, filename: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Stream (line, record, error) tuples out of a CSV or NDJSON upload without loading it whole."""
+    text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+    if filename.lower().endswith(".csv"):
+        for line, row in enumerate(csv.DictReader(text), start=2):
+            yield line, csv_row_to_record(row), None
+        return
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            yield line, None, "invalid JSON: {}".format(e)
+            continue
+        if not isinstance(record, dict):
+            yield line, None, "a JSON object is expected"
+            continue
+        yield line, record, None
+
+
+async def import_members(file: BinaryIO, filename: str, validate: bool = False) -> ImportReport:
+    """Import members from a CSV/NDJSON stream in chunked transactions and report the rows that were rejected."""
+    categories = await get_category_lookup()
+    networks = await get_network_lookup()
+    report = ImportReport()
+    seen = set()
+    chunk: List[Tuple[int, MemberImport]] = []
+
+    async def flush() -> None:
+        created, errors = await insert_member_chunk(chunk, categories, networks, validate)
+        report.created += created
+        report.errors += errors
+        chunk.clear()
+
+    for line, record, error in read_records(file, filename):
+        if error is not None:
+            report.errors.append(ImportRowError(line=line, username=None, detail=error))
+            continue
+        try:
+            member = MemberImport(**record)
+        except ValidationError as e:
+            report.errors.append(ImportRowError(line=line, username=record.get("username"), detail=str(e)))
+            continue
+        unknown = [name for name in member.categories
+                   if await find_lookup_id(get_category_lookup, load_categories, name) is None] + \
+                  [name for name in member.networks
+                   if await find_lookup_id(get_network_lookup, load_networks, name) is None]
+        if unknown:
+            report.errors.append(ImportRowError(line=line, username=member.username,
+                                                detail="unknown category or network: {}".format(", ".join(unknown))))
+            continue
+        if member.username.lower() in seen:
+            report.errors.append(ImportRowError(line=line, username=member.username,
+                                                detail="username is duplicated in the file"))
+            continue
+        seen.add(member.username.lower())
+        chunk.append((line, member))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+    return report
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from app import settings
+
+class Overloaded(Exception):
+    """Raised when no database slot freed up within the admission queue timeout."""
+
+
+class AdmissionController:
+    """Caps the number of database connections checked out at once; extra checkouts wait up to ``queue_timeout``
+    before being shed. Requests served from memory (cache hits, 304s) never take a slot."""
+
+    def __init__(self, max_in_flight: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = 0
+
+    async def acquire(self) -> bool:
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if not await self.acquire():
+            raise Overloaded("No database connection available")
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"max_in_flight": self.max_in_flight, "in_flight": self.in_flight, "waiting": self.waiting,
+                "shed": self.shed}
+
+
+class MemoryBackend:
+    """Token buckets held in the worker; each worker enforces its own share of the limit."""
+
+    MAX_BUCKETS = 10000
+
+    def __init__(self):
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if len(self.buckets) >= self.MAX_BUCKETS and key not in self.buckets:
+            self.prune(now, rate, burst)
+        self.buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+        return tokens
+
+    def prune(self, now: float, rate: float, burst: int) -> None:
+        self.buckets = {key: (tokens, updated) for key, (tokens, updated) in self.buckets.items()
+                        if tokens + (now - updated) * rate < burst}
+
+
+class SharedBackend:
+    """Token buckets stored in the database so every worker draws from the same budget."""
+
+    def __init__(self, take: Callable[[str, float, int], Awaitable[float]]):
+        self._take = take
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return await self._take(key, rate, burst)
+
+
+class RateLimiter:
+    """Per-key token buckets. ``take`` returns the tokens left before the hit, a value below 1 means denied."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.limited = 0
+
+    def use(self, backend) -> None:
+        self.backend = backend
+
+    async def retry_after(self, key: str, rate: float, burst: int) -> Optional[float]:
+        try:
+            tokens = await self.backend.take(key, rate, burst)
+        except Exception as e:
+            print(f"Rate limit backend failed, request allowed: {e}")
+            return None
+        if tokens >= 1:
+            return None
+        self.limited += 1
+        return (1 - tokens) / rate
+
+
+admission = AdmissionController(settings.MAX_IN_FLIGHT, settings.ADMISSION_QUEUE_TIMEOUT)
+limiter = RateLimiter()
@@ -0,0 +1,56 @@
+import hashlib
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# A miss reloads the table at most this often, so a burst of requests naming unknown rows costs one query
+MISS_RELOAD_INTERVAL = 1.0
+
+
+def collation_key(name: str) -> str:
+    """Fold ``name`` the way the tables' ``utf8_general_ci`` collation compares it: case and accent insensitive,
+    trailing spaces ignored."""
+    decomposed = unicodedata.normalize("NFKD", name.rstrip(" ").casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class NameTable:
+    """Versioned in-memory copy of a small, almost static ``id``/``name`` table."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: Dict[int, str] = {}
+        self.loaded = False
+        self.loaded_at: Optional[float] = None
+        self.version = 0
+        self.fingerprint = ""
+
+    def load(self, rows: Iterable[Tuple[int, str]]) -> None:
+        self.names = {id_row: name for id_row, name in rows}
+        self.ids = {collation_key(name): id_row for id_row, name in self.names.items()}
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        self.version += 1
+        # Digest of the rows: equal in every worker that loaded the same table, unlike ``version``
+        self.fingerprint = hashlib.sha1(repr(sorted(self.names.items())).encode()).hexdigest()[:8]
+
+    def may_reload(self) -> bool:
+        """Whether a miss may reload the table: another worker may have added the row since it was loaded."""
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= MISS_RELOAD_INTERVAL
+
+    def invalidate(self) -> None:
+        self.loaded = False
+
+    def id_of(self, name: str) -> Optional[int]:
+        return self.ids.get(collation_key(name))
+
+    def unknown_ids(self, ids: Iterable[int]) -> List[int]:
+        return [id_row for id_row in ids if id_row not in self.names]
+
+    def items(self) -> List[Tuple[int, str]]:
+        return sorted(self.names.items())
+
+
+categories = NameTable()
+networks = NameTable()
+article_types = NameTable()
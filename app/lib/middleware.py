@@ -0,0 +1,207 @@
+import gzip
+import math
+import re
+from typing import Callable, Collection, Iterable, List, Optional, Tuple
+
+import mysql.connector
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.lib.cache import EncodedBody, article_cache, response_cache, versions
+from app.lib.directory import directory
+from app.lib.limits import Overloaded, RateLimiter
+from app.lib.pools import PoolNotReady
+from app.lib.sql import get_category_lookup, get_member_version, get_network_lookup
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+MEMBER_PATH = re.compile(r"^/member/(?:list_category/|category/|network/)?(\d+)$")
+ARTICLE_PATH = re.compile(r"^/article/(\d+)(/html)?$")
+
+
+def cached_entry_for(request: Request) -> Optional[EncodedBody]:
+    """The current cached body a list or article request would be served from, if this worker has it."""
+    path = request.url.path
+    if path == "/member/" and request.query_params.get("sort") == "popularity":
+        return response_cache.get("members_popularity", (directory.version, versions.get("member_stats")))
+    if path == "/member/":
+        return response_cache.get("members", directory.version)
+    if path == "/category/":
+        return response_cache.get("categories", versions.get("categories"))
+    if path == "/network/":
+        return response_cache.get("networks", versions.get("networks"))
+    match = ARTICLE_PATH.match(path)
+    if match:
+        key = ("article_html:%s" if match.group(2) else "article:%s") % match.group(1)
+        return article_cache.get(key, versions.get("article:%s" % match.group(1)))
+    return None
+
+
+def member_of(request: Request) -> Optional[int]:
+    path = request.url.path
+    if path == "/member/image_portfolio_by_id" and request.query_params.get("id_member", "").isdigit():
+        return int(request.query_params["id_member"])
+    match = MEMBER_PATH.match(path)
+    return int(match.group(1)) if match else None
+
+
+async def member_etag(request: Request) -> Optional[str]:
+    """ETag of a per-member resource from the member's stored version and the category and network names it shows;
+    None without a database to read them from, the request is then served without conditional handling."""
+    id_member = member_of(request)
+    if id_member is None:
+        return None
+    try:
+        version = await get_member_version(id_member)
+        categories = await get_category_lookup()
+        networks = await get_network_lookup()
+    except (PoolNotReady, Overloaded, mysql.connector.Error):
+        return None
+    if version is None:
+        return None
+    return 'W/"m{}.{}.{}"'.format(version, categories.fingerprint, networks.fingerprint)
+
+
+def parse_if_none_match(value: str) -> List[str]:
+    return [tag.strip() for tag in value.split(",") if tag.strip()]
+
+
+def matches(etag: str, if_none_match: List[str]) -> bool:
+    return etag in if_none_match or "*" in if_none_match
+
+
+class ConditionalGetMiddleware(BaseHTTPMiddleware):
+    """Answers 304 to revalidations, with ETags that are the same in every worker and across restarts: the hash of
+    the encoded body for lists and articles, the stored member version for per-member resources. Bodies cached by
+    this worker and member versions are checked before the endpoint runs; otherwise the ETag the endpoint sent is
+    compared. ``on_not_modified`` is called for each 304 answered before the endpoint ran, in place of the side
+    effects it would have had."""
+
+    def __init__(self, app: ASGIApp, on_not_modified: Optional[Callable[[Request], None]] = None):
+        super().__init__(app)
+        self.on_not_modified = on_not_modified
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method not in ("GET", "HEAD"):
+            return await call_next(request)
+        if_none_match = parse_if_none_match(request.headers.get("if-none-match", ""))
+        entry = cached_entry_for(request)
+        etag = entry.etag if entry is not None else await member_etag(request)
+        if etag is not None and matches(etag, if_none_match):
+            if self.on_not_modified is not None:
+                self.on_not_modified(request)
+            return Response(status_code=304, headers={"ETag": etag})
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        etag = response.headers.get("ETag", etag)
+        if etag is None:
+            return response
+        response.headers["ETag"] = etag
+        if matches(etag, if_none_match):
+            return Response(status_code=304, headers={"ETag": etag})
+        return response
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """Answers 429 with ``Retry-After`` once any of the buckets named by ``keys`` is empty. Added before
+    ``CORSMiddleware`` so that browsers can read the 429 instead of reporting a CORS failure."""
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter,
+                 keys: Callable[[Request], Iterable[Tuple[str, float, int]]], exempt_paths: Collection[str] = ()):
+        super().__init__(app)
+        self.limiter = limiter
+        self.keys = keys
+        self.exempt_paths = exempt_paths
+
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path not in self.exempt_paths:
+            for key, rate, burst in self.keys(request):
+                retry_after = await self.limiter.retry_after(key, rate, burst)
+                if retry_after is not None:
+                    return JSONResponse(status_code=429, content={"detail": "Too many requests"},
+                                        headers={"Retry-After": str(math.ceil(retry_after))})
+        return await call_next(request)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, compresslevel: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=compresslevel)
+    return gzip.compress(body, compresslevel=compresslevel)
+
+
+class CompressionMiddleware:
+    """Compresses JSON/text responses above ``minimum_size`` with brotli (when installed) or gzip."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+        chunks: List[bytes] = []
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                passthrough = "content-encoding" in headers or \
+                    not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            headers = MutableHeaders(raw=start_message["headers"])
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding, self.compresslevel)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+            headers["Content-Length"] = str(len(body))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,184 @@
+import asyncio
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool
+
+from app import settings
+
+# Seconds a replica probe may wait for the connection before the replica is reported unavailable
+PROBE_CONNECT_TIMEOUT = 2
+
+
+def create_pool(name: str, host: str, port: int) -> MySQLConnectionPool:
+    # The session must not be reset when a connection goes back to the pool, otherwise the server drops the
+    # statements prepared on it by the query registry.
+    return MySQLConnectionPool(
+        pool_name=name,
+        host=host,
+        user=settings.USER,
+        password=settings.PASSWORD,
+        database=settings.DATABASE,
+        port=port,
+        pool_size=settings.POOL_SIZE,
+        pool_reset_session=False
+    )
+
+
+class PoolNotReady(Exception):
+    """Raised instead of connecting from a request while the primary pool has not been opened yet."""
+
+
+class Replica:
+    def __init__(self, name: str, host: str, port: int):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.pool: Optional[MySQLConnectionPool] = None
+        self.lag: Optional[int] = None
+        self.healthy = False
+
+    def get_pool(self) -> MySQLConnectionPool:
+        if self.pool is None:
+            self.pool = create_pool(self.name, self.host, self.port)
+        return self.pool
+
+    def probe(self) -> None:
+        """Blocking health check: the replica is used only while its replication lag is known and acceptable. It uses a
+        connection of its own, a pool busy serving reads has none to spare."""
+        try:
+            connection = mysql.connector.connect(host=self.host, port=self.port, user=settings.USER,
+                                                 password=settings.PASSWORD, database=settings.DATABASE,
+                                                 connection_timeout=PROBE_CONNECT_TIMEOUT)
+            try:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute("SHOW SLAVE STATUS")
+                status = cursor.fetchone()
+                cursor.close()
+            finally:
+                connection.close()
+        except mysql.connector.Error as e:
+            print(f"Replica {self.name} is unavailable: {e}")
+            self.lag = None
+            self.healthy = False
+            return
+        self.lag = status.get("Seconds_Behind_Master") if status else None
+        self.healthy = self.lag is not None and self.lag <= settings.REPLICA_MAX_LAG
+
+
+class PoolRouter:
+    """Routes connections to the primary or to a healthy read replica.
+
+    A member who has just written is pinned to the primary for ``STICKY_SECONDS`` so they read their own writes.
+    """
+
+    def __init__(self):
+        self._primary: Optional[MySQLConnectionPool] = None
+        self._lock = threading.Lock()
+        self._opening: Optional[asyncio.Future] = None
+        self.replicas: List[Replica] = []
+        for index, replica in enumerate(settings.REPLICAS):
+            host, _, port = replica.partition(":")
+            self.replicas.append(Replica("replica_%d" % index, host, int(port or 3306)))
+        self._round_robin = itertools.cycle(self.replicas)
+        self._sticky_until: Dict[int, float] = {}
+
+    def open(self) -> MySQLConnectionPool:
+        """Blocking: create the primary pool. Called by the warm-up task and the CLI, never from the event loop."""
+        if self._primary is None:
+            with self._lock:
+                if self._primary is None:
+                    self._primary = create_pool("primary", settings.HOST, settings.PORT)
+        return self._primary
+
+    def primary(self) -> MySQLConnectionPool:
+        """The primary pool; requests fail fast with ``PoolNotReady`` until it is open, instead of blocking the event
+        loop on the connect timeout. The first such request starts opening it, for hosts that never run the lifespan
+        warm-up (serverless)."""
+        if self._primary is None:
+            self.open_in_background()
+            raise PoolNotReady("The connection pool is not ready")
+        return self._primary
+
+    def open_in_background(self) -> None:
+        """Start ``open`` in the executor unless an attempt is already running; a failed attempt is retried by the
+        next call."""
+        if self._opening is not None and not self._opening.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._opening = loop.run_in_executor(None, self.open)
+        self._opening.add_done_callback(report_open_failure)
+
+    def ready(self) -> bool:
+        return self._primary is not None
+
+    def reader(self, id_member: Optional[int] = None) -> MySQLConnectionPool:
+        if id_member is not None and self._sticky_until.get(id_member, 0) > time.monotonic():
+            return self.primary()
+        for _ in range(len(self.replicas)):
+            replica = next(self._round_robin)
+            if replica.healthy:
+                return replica.get_pool()
+        return self.primary()
+
+    def is_primary(self, pool: MySQLConnectionPool) -> bool:
+        return pool is self._primary
+
+    def replica_failed(self, pool: MySQLConnectionPool, error: Exception) -> None:
+        """A checkout from a replica pool failed: the replica is skipped until the next probe, unless it was only out
+        of idle connections."""
+        if isinstance(error, PoolError):
+            return
+        for replica in self.replicas:
+            if replica.pool is pool:
+                print(f"Replica {replica.name} is unavailable: {error}")
+                replica.healthy = False
+
+    def mark_written(self, id_member: int) -> None:
+        now = time.monotonic()
+        self._sticky_until[id_member] = now + settings.STICKY_SECONDS
+        if len(self._sticky_until) > 10000:
+            self._sticky_until = {key: until for key, until in self._sticky_until.items() if until > now}
+
+    def probe_replicas(self) -> None:
+        for replica in self.replicas:
+            replica.probe()
+
+    def stats(self) -> Dict[str, Any]:
+        replicas = {replica.name: {"healthy": replica.healthy, "lag": replica.lag,
+                                   "pool": pool_stats(replica.pool)} for replica in self.replicas}
+        return {"primary": pool_stats(self._primary), "replicas": replicas, "sticky_members": len(self._sticky_until)}
+
+    def close(self) -> None:
+        """Close the idle connections of every pool; a connection still checked out is closed when it is returned
+        since its pool no longer accepts it."""
+        pools_to_close = [self._primary] + [replica.pool for replica in self.replicas]
+        self._primary = None
+        for replica in self.replicas:
+            replica.pool = None
+            replica.healthy = False
+        for pool in pools_to_close:
+            if pool is not None:
+                pool._remove_connections()
+
+
+def report_open_failure(opening: asyncio.Future) -> None:
+    if not opening.cancelled() and opening.exception() is not None:
+        print(f"Opening the connection pool failed: {opening.exception()}")
+
+
+def pool_stats(pool: Optional[MySQLConnectionPool]) -> Optional[Dict[str, int]]:
+    if pool is None:
+        return None
+    idle = pool._cnx_queue.qsize()
+    return {"size": pool.pool_size, "idle": idle, "in_use": pool.pool_size - idle}
+
+
+pools = PoolRouter()
@@ -0,0 +1,214 @@
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from weakref import WeakKeyDictionary
+
+from app.lib.db import run_blocking
+
+
+class Statement:
+    """A named, fixed SQL statement and its execution statistics."""
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.prepares = 0
+        self.total_time = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prepares": self.prepares,
+            "total_ms": round(self.total_time * 1000, 3),
+            "avg_ms": round(self.total_time * 1000 / self.calls, 3) if self.calls else 0.0,
+        }
+
+
+class BoundStatement:
+    """A statement bound to the prepared cursor of one pooled connection."""
+
+    def __init__(self, statement: Statement, cursor: Any):
+        self.statement = statement
+        self.cursor = cursor
+        self.events: List[Tuple[str, Optional[int]]] = []
+
+    def publish(self, topic: str, key: Optional[int] = None) -> None:
+        """Queue a change event: it is written with this transaction and dispatched once the transaction commits."""
+        self.events.append((topic, key))
+
+    async def execute(self, params: Sequence[Any] = ()) -> None:
+        await self._timed(self.cursor.execute, self.statement.sql, params)
+
+    async def executemany(self, seq_params: List[Sequence[Any]]) -> None:
+        await self._timed(self.cursor.executemany, self.statement.sql, seq_params)
+
+    async def fetchone(self) -> Optional[Sequence[Any]]:
+        # Prepared cursors are unbuffered: the whole result is read so no unread row is left on the connection.
+        rows = await self.fetchall()
+        return rows[0] if rows else None
+
+    async def fetchall(self) -> List[Sequence[Any]]:
+        return await run_blocking(self.cursor.fetchall)
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self.cursor.lastrowid
+
+    async def _timed(self, function, *args) -> None:
+        started = perf_counter()
+        self.statement.calls += 1
+        try:
+            await run_blocking(function, *args)
+        except Exception:
+            self.statement.errors += 1
+            raise
+        finally:
+            self.statement.total_time += perf_counter() - started
+
+
+class QueryRegistry:
+    """Central registry of the fixed query set.
+
+    Each statement is prepared server-side at most once per pooled connection: the prepared cursor is cached on
+    the underlying connection and reused every time that connection is handed out again by the pool. The pool
+    reconnects a dead connection in place, so the cache also records the server session it was prepared in and is
+    dropped when the connection id changes.
+    """
+
+    def __init__(self):
+        self.statements: Dict[str, Statement] = {}
+        self._prepared: "WeakKeyDictionary[Any, Tuple[Optional[int], Dict[str, Any]]]" = WeakKeyDictionary()
+
+    def register(self, name: str, sql: str) -> Statement:
+        if name in self.statements:
+            raise ValueError("Statement {} is already registered".format(name))
+        statement = self.statements[name] = Statement(name, sql)
+        return statement
+
+    def bind(self, connection: Any, name: str) -> BoundStatement:
+        statement = self.statements[name]
+        raw_connection = getattr(connection, "_cnx", connection)
+        session, cursors = self._prepared.get(raw_connection, (None, None))
+        if cursors is None or session != raw_connection.connection_id:
+            cursors = {}
+            self._prepared[raw_connection] = (raw_connection.connection_id, cursors)
+        cursor = cursors.get(name)
+        if cursor is None:
+            cursor = cursors[name] = raw_connection.cursor(prepared=True)
+            statement.prepares += 1
+        return BoundStatement(statement, cursor)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: statement.stats() for name, statement in self.statements.items()}
+
+
+queries = QueryRegistry()
+
+queries.register("ping", "SELECT 1")
+queries.register("directory",
+                 "SELECT member.id, member.username, member.url_portfolio, category.name FROM member "
+                 "LEFT JOIN member_has_category ON member_has_category.id_member = member.id "
+                 "LEFT JOIN category ON category.id = member_has_category.id_category "
+                 "WHERE member.date_validate IS NOT NULL AND member.date_deleted IS NULL "
+                 "ORDER BY member.id, category.name")
+queries.register("directory_member",
+                 "SELECT member.id, member.username, member.url_portfolio, category.name FROM member "
+                 "LEFT JOIN member_has_category ON member_has_category.id_member = member.id "
+                 "LEFT JOIN category ON category.id = member_has_category.id_category "
+                 "WHERE member.date_validate IS NOT NULL AND member.date_deleted IS NULL AND member.id = %s "
+                 "ORDER BY category.name")
+queries.register("member_by_id",
+                 "SELECT id, username, firstname, lastname, description, mail, url_portfolio FROM member WHERE id = %s")
+queries.register("member_create",
+                 "INSERT INTO member (username, firstname, lastname, description, mail, url_portfolio) "
+                 "VALUES (%s, %s, %s, %s, %s, %s)")
+queries.register("member_update",
+                 "UPDATE member SET firstname = %s, lastname = %s, description = %s, mail = %s, url_portfolio = %s "
+                 "WHERE id = %s")
+queries.register("member_validate", "UPDATE member SET date_validate = NOW() WHERE id = %s")
+queries.register("member_ban", "UPDATE member SET date_deleted = NOW() WHERE id = %s")
+queries.register("member_unban", "UPDATE member SET date_deleted = null WHERE id = %s")
+queries.register("member_is_admin", "SELECT is_admin FROM member WHERE id = %s")
+queries.register("member_all_admin",
+                 "SELECT id, username, firstname, lastname, description, mail, url_portfolio, date_validate, "
+                 "date_deleted FROM member")
+queries.register("member_image_update", "UPDATE member SET image_portfolio = %s WHERE id = %s")
+queries.register("member_image", "SELECT image_portfolio FROM member WHERE id = %s")
+queries.register("member_version", "SELECT version FROM member WHERE id = %s")
+queries.register("member_version_bump", "UPDATE member SET version = version + 1 WHERE id = %s")
+queries.register("members_by_category",
+                 "SELECT member.id, member.username, member.url_portfolio FROM member, member_has_category, category "
+                 "WHERE member.id = member_has_category.id_member AND member_has_category.id_category = category.id "
+                 "AND category.name = %s AND member.date_validate IS NOT NULL AND member.date_deleted IS NULL")
+queries.register("category_all", "SELECT id, name FROM category")
+queries.register("category_create", "INSERT INTO category (name) VALUES (%s)")
+queries.register("category_delete", "DELETE FROM category WHERE id = %s")
+queries.register("member_category_add",
+                 "INSERT INTO member_has_category (id_member, id_category) VALUES (%s, %s) "
+                 "ON DUPLICATE KEY UPDATE id_member=id_member")
+queries.register("member_category_delete",
+                 "DELETE FROM member_has_category WHERE id_member = %s AND id_category = %s")
+queries.register("member_category_delete_by_category", "DELETE FROM member_has_category WHERE id_category = %s")
+queries.register("member_categories_names",
+                 "SELECT category.name FROM category, member, member_has_category WHERE member.id = "
+                 "member_has_category.id_member AND member_has_category.id_category = category.id AND member.id = %s")
+queries.register("member_categories",
+                 "SELECT member_has_category.id_member, category.name, member_has_category.id_category FROM "
+                 "member, member_has_category, category WHERE member.id = member_has_category.id_member AND "
+                 "member_has_category.id_category = category.id AND member.id = %s")
+queries.register("network_all", "SELECT Id AS id, name FROM network")
+queries.register("network_create", "INSERT INTO network (name) VALUES (%s)")
+queries.register("network_delete", "DELETE FROM network WHERE Id = %s")
+queries.register("member_networks",
+                 "SELECT network.name, member_has_network.url, member_has_network.id_network FROM network, "
+                 "member_has_network, member WHERE member.id = member_has_network.id_member AND "
+                 "member_has_network.id_network = network.id AND member.id = %s")
+queries.register("member_network_upsert",
+                 "INSERT INTO member_has_network (id_member, id_network, url) VALUES (%s, %s, %s) "
+                 "ON DUPLICATE KEY UPDATE url = VALUES(url)")
+queries.register("member_network_delete",
+                 "DELETE FROM member_has_network WHERE id_member = %s AND id_network = %s")
+queries.register("member_network_delete_by_network", "DELETE FROM member_has_network WHERE id_network = %s")
+queries.register("session_by_member",
+                 "SELECT token_session, token_refresh, id_member, date_created FROM session WHERE id_member = %s")
+queries.register("session_delete", "DELETE FROM session WHERE id_member = %s")
+queries.register("change_event_insert", "INSERT INTO change_event (topic, event_key, origin) VALUES (%s, %s, %s)")
+queries.register("change_event_last_id", "SELECT COALESCE(MAX(id), 0), NULL, NULL, NULL FROM change_event")
+queries.register("change_event_since",
+                 "SELECT id, topic, event_key, origin FROM change_event WHERE id > %s ORDER BY id LIMIT %s")
+queries.register("change_event_range",
+                 "SELECT id, topic, event_key, origin FROM change_event WHERE id BETWEEN %s AND %s ORDER BY id")
+queries.register("change_event_prune", "DELETE FROM change_event WHERE date_created < NOW() - INTERVAL 1 DAY")
+queries.register("member_popularity", "SELECT id_member FROM member_stats ORDER BY popularity DESC, id_member DESC")
+queries.register("article_type_all", "SELECT id, name FROM article_type")
+queries.register("article_type_create", "INSERT INTO article_type (name) VALUES (%s)")
+queries.register("article_by_id",
+                 "SELECT id, id_type, id_member, title, content, date_published, date_updated FROM article WHERE id = %s")
+queries.register("article_create",
+                 "INSERT INTO article (id_type, id_member, title, content, date_published) VALUES (%s, %s, %s, %s, NOW())")
+queries.register("article_update",
+                 "UPDATE article SET id_type = %s, title = %s, content = %s, date_updated = NOW() WHERE id = %s")
+queries.register("article_delete", "DELETE FROM article WHERE id = %s")
+# Keyset pagination: the (date_published, id) cursor is spelled out so each variant is a range scan of its index.
+queries.register("article_feed",
+                 "SELECT id, id_type, id_member, title, date_published, views FROM article "
+                 "WHERE date_published < %s OR (date_published = %s AND id < %s) "
+                 "ORDER BY date_published DESC, id DESC LIMIT %s")
+queries.register("article_feed_by_type",
+                 "SELECT id, id_type, id_member, title, date_published, views FROM article "
+                 "WHERE id_type = %s AND (date_published < %s OR (date_published = %s AND id < %s)) "
+                 "ORDER BY date_published DESC, id DESC LIMIT %s")
+queries.register("article_feed_by_member",
+                 "SELECT id, id_type, id_member, title, date_published, views FROM article "
+                 "WHERE id_member = %s AND (date_published < %s OR (date_published = %s AND id < %s)) "
+                 "ORDER BY date_published DESC, id DESC LIMIT %s")
+queries.register("article_feed_by_type_member",
+                 "SELECT id, id_type, id_member, title, date_published, views FROM article "
+                 "WHERE id_member = %s AND id_type = %s AND (date_published < %s OR (date_published = %s AND id < %s)) "
+                 "ORDER BY date_published DESC, id DESC LIMIT %s")
@@ -0,0 +1,37 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+
+class RowMapper:
+    """Maps result rows straight into ``model`` instances.
+
+    Column positions are resolved from ``cursor.description`` once per column layout and reused, and rows are
+    built with ``construct`` since they come from our own schema and do not need to be validated again.
+    ``columns`` maps a model field to a column of a different name.
+    """
+
+    def __init__(self, model: Type[BaseModel], **columns: str):
+        self.model = model
+        self.columns = columns
+        self._plans: Dict[Tuple[str, ...], List[Tuple[str, int]]] = {}
+
+    def plan(self, description: Sequence[Tuple]) -> List[Tuple[str, int]]:
+        names = tuple(column[0] for column in description)
+        plan = self._plans.get(names)
+        if plan is None:
+            positions = {name: index for index, name in enumerate(names)}
+            plan = [(field, positions[self.columns.get(field, field)]) for field in self.model.__fields__
+                    if self.columns.get(field, field) in positions]
+            self._plans[names] = plan
+        return plan
+
+    def map(self, description: Sequence[Tuple], rows: Sequence[Sequence[Any]]) -> List[BaseModel]:
+        plan = self.plan(description)
+        construct = self.model.construct
+        return [construct(**{field: row[index] for field, index in plan}) for row in rows]
+
+    def map_one(self, description: Sequence[Tuple], row: Optional[Sequence[Any]]) -> Optional[BaseModel]:
+        if row is None:
+            return None
+        return self.map(description, [row])[0]
@@ -1,344 +1,556 @@
-from contextlib import contextmanager
+import time
+from contextlib import asynccontextmanager
 from collections import namedtuple
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Callable, Awaitable, Iterable
 
 from fastapi import UploadFile
 
 from app.models import *
+from app.lib.cache import article_cache, member_versions, response_cache, versions
+from app.lib.db import AsyncCursor, run_blocking
+from app.lib.directory import directory
+from app.lib.events import OutboxTransport, changes
+from app.lib import lookups
+from app.lib.limits import admission
+from app.lib.pools import pools
+from app.lib.queries import queries
+from app.lib.rows import RowMapper
+from app.models.member_has_category import MemberHasCategoryOut
 
 from app import settings
 from datetime import datetime, timedelta
 import mysql.connector
-from mysql.connector.pooling import MySQLConnectionPool
 
-MemberHasCategoryOut = namedtuple("MemberHasCategoryOut", ["id_member", "name", "id_category"])
-
-pool = MySQLConnectionPool(
-    host=settings.HOST,
-    user=settings.USER,
-    password=settings.PASSWORD,
-    database=settings.DATABASE,
-    port=settings.PORT,
-    pool_size=3
-)
-
-@contextmanager
+SessionRecord = namedtuple("Session", ["access_token", "refresh_token", "id_member", "date_created"])
+
+SESSION_MINUTES = 60
+PROFILE_VIEW = "profile"
+IMAGE_VIEW = "image"
+CHANGE_EVENT_BATCH = 500
+
+# Sent as a single multi-statement round-trip inside one transaction: creates the member on first login (the
+# unique username key makes concurrent first logins converge on one row), then keeps the current session if it
+# is still valid or rotates its tokens, and reads back the session that is now in place.
+LOGIN_QUERY = "INSERT INTO member (username) VALUES (%(username)s) " \
+              "ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id); " \
+              "INSERT INTO session (token_session, token_refresh, id_member) " \
+              "VALUES (%(access_token)s, %(refresh_token)s, LAST_INSERT_ID()) ON DUPLICATE KEY UPDATE " \
+              "token_session = IF(date_created + INTERVAL %(minutes)s MINUTE > NOW(), token_session, VALUES(token_session)), " \
+              "token_refresh = IF(date_created + INTERVAL %(minutes)s MINUTE > NOW(), token_refresh, VALUES(token_refresh)), " \
+              "date_created = IF(date_created + INTERVAL %(minutes)s MINUTE > NOW(), date_created, NOW()); " \
+              "SELECT token_session, token_refresh, id_member, date_created FROM session WHERE id_member = LAST_INSERT_ID()"
+
+# Token bucket refill and hit in one upsert; `allowed` is computed from the refilled value before `tokens` is
+# overwritten since MySQL applies the assignments from left to right.
+RATE_LIMIT_QUERY = "INSERT INTO rate_limit (bucket, tokens, updated, allowed) VALUES (%(bucket)s, %(burst)s - 1, %(now)s, 1) " \
+                   "ON DUPLICATE KEY UPDATE " \
+                   "allowed = LEAST(%(burst)s, tokens + (VALUES(updated) - updated) * %(rate)s) >= 1, " \
+                   "tokens = LEAST(%(burst)s, tokens + (VALUES(updated) - updated) * %(rate)s) - allowed, " \
+                   "updated = VALUES(updated)"
+
+MEMBER_IN = RowMapper(MemberIn)
+MEMBER_OUT = RowMapper(MemberOut, date_activated="date_validate")
+GET_MEMBERS = RowMapper(GetMembers)
+CATEGORY_OUT = RowMapper(CategoryOut)
+MEMBER_HAS_CATEGORY_OUT = RowMapper(MemberHasCategoryOut)
+GET_MEMBER_HAS_NETWORK = RowMapper(GetMemberHasNetwork)
+ARTICLE = RowMapper(Article)
+ARTICLE_SUMMARY = RowMapper(ArticleSummary)
+
+# Keyset cursor used for the first page of the article feed: after every DATETIME and every id
+FEED_START = (datetime(9999, 12, 31, 23, 59, 59), 2 ** 31 - 1)
+
+async def commit(connection: Any, events: List[Tuple[str, Optional[int]]]) -> None:
+    """Commit, writing the queued change events to the outbox in the same transaction: an event exists if and only
+    if its change was committed. The stored version of every changed member moves with it, for their ETags."""
+    id_members = sorted({key for topic, key in events if topic == "member" and key is not None})
+    if id_members:
+        statement = queries.bind(connection, "member_version_bump")
+        await statement.executemany([(id_member,) for id_member in id_members])
+    if events and changes.transport.outbox:
+        statement = queries.bind(connection, "change_event_insert")
+        await statement.executemany([(topic, key, changes.origin) for topic, key in events])
+    await run_blocking(connection.commit)
+
+async def dispatch(events: List[Tuple[str, Optional[int]]]) -> None:
+    for topic, key in events:
+        await changes.dispatch(changes.event(topic, key))
+
+@asynccontextmanager
 async def get_cursor(commit_on_exit=True):
-    async with pool.connection() as connection:
-        async with connection.cursor() as cursor:
-            try:
-                yield cursor
-                if commit_on_exit:
-                    await connection.commit()
-            except Exception as e:
-                await connection.rollback()
+    pool = pools.primary()
+    async with admission.slot():
+        connection = await run_blocking(pool.get_connection)
+        cursor = AsyncCursor(connection.cursor(buffered=True))
+        try:
+            yield cursor
+            if commit_on_exit:
+                await commit(connection, cursor.events)
+        except Exception as e:
+            await run_blocking(connection.rollback)
+            raise e
+        finally:
+            cursor.close()
+            await run_blocking(connection.close)
+    await dispatch(cursor.events)
+
+@asynccontextmanager
+async def get_statement(name: str, commit_on_exit=True, read_only=False, id_member: Optional[int] = None):
+    """Writes, session checks and the loads that fill the in-memory caches go to the primary; other reads may be
+    served by a replica unless ``id_member`` has just written, and fall back to the primary when no replica connection
+    can be checked out.
+
+    The connection is checked out through the admission controller and released before the change handlers run,
+    since they may need a connection of their own."""
+    pool = pools.reader(id_member) if read_only else pools.primary()
+    async with admission.slot():
+        try:
+            connection = await run_blocking(pool.get_connection)
+        except mysql.connector.Error as e:
+            if pools.is_primary(pool):
                 raise e
-            finally:
-                await cursor.close()
-                await connection.close()
-                
+            pools.replica_failed(pool, e)
+            connection = await run_blocking(pools.primary().get_connection)
+        try:
+            statement = queries.bind(connection, name)
+            yield statement
+            if commit_on_exit:
+                await commit(connection, statement.events)
+        except Exception as e:
+            await run_blocking(connection.rollback)
+            raise e
+        finally:
+            await run_blocking(connection.close)
+    await dispatch(statement.events)
+
+async def get_member_version(id_member: int) -> Optional[int]:
+    """Stored version of the member, bumped with every change to the member, None for an unknown member."""
+    version = member_versions.get(id_member)
+    if version is None:
+        evictions = member_versions.evictions
+        async with get_statement("member_version", commit_on_exit=False) as statement:
+            await statement.execute((id_member,))
+            result = await statement.fetchone()
+        if result is None:
+            return None
+        version = result[0]
+        member_versions.put(id_member, version, evictions)
+    return version
+
 async def get_members() -> List[MemberWithCategory]:
-    async with get_cursor() as cursor:
-        await cursor.execute("SELECT member.id, member.username, member.url_portfolio, member.date_validate, "
-                             "member.date_deleted, GROUP_CONCAT(category.name) FROM member, member_has_category, category WHERE "
-                             "member.id=member_has_category.id_member AND member_has_category.id_category=category.id GROUP BY "
-                             "member.id")
-        result = await cursor.fetchall()
-        member_record = namedtuple("Member", ["id", "username", "url_portfolio", "date_validate", "date_deleted", "name"])
-        return [map_member_record_to_member_with_category(member) for member in result
-                if member.date_validate is not None and member.date_deleted is None]
-
-def map_member_record_to_member_with_category(member_record: Any) -> MemberWithCategory:
-    return MemberWithCategory(id_member=member_record.id, username=member_record.username, url_portfolio=member_record.url_portfolio,
-                               category_name=member_record.name)
+    if not directory.loaded:
+        async with directory.lock:
+            if not directory.loaded:
+                await load_directory()
+    return directory.list()
+
+async def load_directory() -> None:
+    """Called with ``directory.lock`` held. A member refresh arriving meanwhile waits for the lock and is applied on top
+    of the loaded rows; an invalidation (which does not wait) makes the load read the rows again."""
+    while True:
+        version = directory.version
+        async with get_statement("directory") as statement:
+            await statement.execute()
+            result = await statement.fetchall()
+        if directory.version == version:
+            directory.load(map_directory_records_to_members_with_category(result))
+            return None
 
-async def get_member_by_id(id_member: int) -> Optional[MemberIn]:
-    async with get_cursor() as cursor:
-        member_record = namedtuple("Member",
-                                   ["id", "username", "firstname", "lastname", "description", "mail", "url_portfolio",
-                                    "date_validate", "date_deleted"])
-        query = "SELECT {} FROM member WHERE id = %(id)s".format(", ".join(member_record._fields))
-        await cursor.execute(query, {'id': id_member})
-        result = await cursor.fetchone()
-        if result is None:
+async def refresh_directory_member(id_member: int) -> None:
+    async with directory.lock:
+        if not directory.loaded:
             return None
-        member = member_record._make(result)
-        return map_member_record_to_member_in(member)
+        async with get_statement("directory_member") as statement:
+            await statement.execute((id_member,))
+            result = await statement.fetchall()
+        members = map_directory_records_to_members_with_category(result)
+        if members:
+            directory.upsert(members[0])
+        else:
+            directory.remove(id_member)
+
+# The handlers drop what they cannot refresh before reloading it: a reload shed by the admission controller then
+# leaves the data to be loaded by the next reader instead of served stale under an unchanged version.
+
+async def on_member_changed(id_member: int) -> None:
+    pools.mark_written(id_member)
+    member_versions.evict(id_member)
+    try:
+        await refresh_directory_member(id_member)
+    except Exception:
+        directory.invalidate()
+        raise
+
+async def on_category_changed(key: Optional[int]) -> None:
+    lookups.categories.invalidate()
+    versions.bump("categories")
+    directory.invalidate()
+    await load_categories()
+
+async def on_network_changed(key: Optional[int]) -> None:
+    lookups.networks.invalidate()
+    versions.bump("networks")
+    await load_networks()
+
+async def on_directory_changed(key: Optional[int]) -> None:
+    directory.invalidate()
+
+async def on_article_changed(id_article: int) -> None:
+    versions.bump("article:%d" % id_article)
+    article_cache.evict("article:%d" % id_article)
+    article_cache.evict("article_html:%d" % id_article)
+
+async def on_article_type_changed(key: Optional[int]) -> None:
+    await load_article_types()
+
+changes.subscribe("member", on_member_changed)
+changes.subscribe("category", on_category_changed)
+changes.subscribe("network", on_network_changed)
+changes.subscribe("directory", on_directory_changed)
+changes.subscribe("article", on_article_changed)
+changes.subscribe("article_type", on_article_type_changed)
+
+async def expire_caches() -> None:
+    """Safety net for change events that never arrived: everything derived from the database is dropped and the
+    lookup tables are reloaded. ETags are derived from the bodies and the stored versions, so unchanged data keeps
+    its ETag."""
+    versions.expire()
+    member_versions.clear()
+    response_cache.clear()
+    article_cache.clear()
+    directory.invalidate()
+    await load_lookups()
+    await load_article_types()
+
+async def get_change_events(after: Optional[int]) -> List[Any]:
+    async with get_statement("change_event_last_id" if after is None else "change_event_since") as statement:
+        await statement.execute(() if after is None else (after, CHANGE_EVENT_BATCH))
+        return await statement.fetchall()
+
+async def get_change_events_between(first: int, last: int) -> List[Any]:
+    async with get_statement("change_event_range") as statement:
+        await statement.execute((first, last))
+        return await statement.fetchall()
+
+async def prune_change_events() -> None:
+    async with get_statement("change_event_prune") as statement:
+        await statement.execute()
+
+if settings.EVENT_TRANSPORT == "outbox":
+    changes.use(OutboxTransport(get_change_events, get_change_events_between, prune_change_events))
+
+async def ping_database() -> None:
+    async with get_statement("ping", commit_on_exit=False) as statement:
+        await statement.execute()
+        await statement.fetchone()
+
+async def take_rate_limit_token(bucket: str, rate: float, burst: int) -> float:
+    async with get_cursor() as cursor:
+        await cursor.execute(RATE_LIMIT_QUERY, {"bucket": bucket, "rate": rate, "burst": burst, "now": time.time()})
+        await cursor.execute("SELECT tokens, allowed FROM rate_limit WHERE bucket = %(bucket)s", {"bucket": bucket})
+        tokens, allowed = await cursor.fetchone()
+    return tokens + 1 if allowed else tokens
+
+def map_directory_records_to_members_with_category(records: List[Any]) -> List[MemberWithCategory]:
+    members: Dict[int, MemberWithCategory] = {}
+    for id_member, username, url_portfolio, category_name in records:
+        member = members.get(id_member)
+        if member is None:
+            member = members[id_member] = MemberWithCategory.construct(id_member=id_member, username=username,
+                                                                       url_portfolio=url_portfolio, category_name=[])
+        if category_name is not None:
+            member.category_name.append(category_name)
+    return list(members.values())
 
-def map_member_record_to_member_in(member_record: Any) -> MemberIn:
-    return MemberIn(id=member_record.id, username=member_record.username, firstname=member_record.firstname, lastname=member_record.lastname,
-                    description=member_record.description, mail=member_record.mail, url_portfolio=member_record.url_portfolio)
+async def get_member_by_id(id_member: int) -> Optional[MemberIn]:
+    async with get_statement("member_by_id", read_only=True, id_member=id_member) as statement:
+        await statement.execute((id_member,))
+        result = await statement.fetchone()
+        return MEMBER_IN.map_one(statement.description, result)
 
 async def create_member(member: MemberIn) -> int:
-    async with get_cursor() as cursor:
-        sql = "INSERT INTO member (username, firstname, lastname, description, mail, url_portfolio) VALUES (%s, %s, %s, " \
-              "%s, %s, %s)"
+    async with get_statement("member_create") as statement:
         val = (member.username, member.firstname, member.lastname, member.description, member.mail, member.url_portfolio)
         try:
-            await cursor.execute(sql, val)
+            await statement.execute(val)
         except mysql.connector.Error:
             return "ErrorSQL: the request was unsuccessful..."
-        id = cursor.lastrowid
+        id = statement.lastrowid
         return id
 
 async def patch_member_update(member: MemberOut) -> None:
-    async with get_cursor() as cursor:
-        sql = "UPDATE member SET firstname = %s, lastname = %s, description = %s, mail = %s, url_portfolio " \
-              "= %s WHERE id = %s"
+    async with get_statement("member_update") as statement:
         val = (member.firstname, member.lastname, member.description, member.mail, member.url_portfolio, member.id)
         try:
-            await cursor.execute(sql, val)
+            await statement.execute(val)
         except mysql.connector.Error:
             return "ErrorSQL: the request was unsuccessful..."
-        return None
-async def get_categories() -> List[Category]:
-    async with get_cursor() as cursor:
-        await cursor.execute("SELECT id, name FROM category")
-        result = await cursor.fetchall()
-        category_record = namedtuple("Category", ["id", "name"])
-        return [map_category_record_to_category(category) for category in result]
+        statement.publish("member", member.id)
+    return None
+
+async def load_categories() -> None:
+    lookups.categories.invalidate()
+    async with get_statement("category_all") as statement:
+        await statement.execute()
+        result = await statement.fetchall()
+    lookups.categories.load(result)
+
+async def load_networks() -> None:
+    lookups.networks.invalidate()
+    async with get_statement("network_all") as statement:
+        await statement.execute()
+        result = await statement.fetchall()
+    lookups.networks.load(result)
+
+async def load_lookups() -> None:
+    await load_categories()
+    await load_networks()
+
+async def get_category_lookup() -> lookups.NameTable:
+    if not lookups.categories.loaded:
+        await load_categories()
+    return lookups.categories
+
+async def get_network_lookup() -> lookups.NameTable:
+    if not lookups.networks.loaded:
+        await load_networks()
+    return lookups.networks
+
+async def find_lookup_id(get_lookup: Callable[[], Awaitable[lookups.NameTable]], load: Callable[[], Awaitable[None]],
+                         name: str) -> Optional[int]:
+    """Id of ``name`` in the table, reloading it once on a miss since another worker may have just added the row."""
+    table = await get_lookup()
+    if table.id_of(name) is None and table.may_reload():
+        await load()
+    return table.id_of(name)
+
+async def find_unknown_ids(get_lookup: Callable[[], Awaitable[lookups.NameTable]], load: Callable[[], Awaitable[None]],
+                           ids: Iterable[int]) -> List[int]:
+    """Ids missing from the table, after reloading it once if some were not found."""
+    table = await get_lookup()
+    if table.unknown_ids(ids) and table.may_reload():
+        await load()
+    return table.unknown_ids(ids)
 
-def map_category_record_to_category(category_record: Any) -> Category:
-    return Category(id=category_record.id, name=category_record.name)
+async def get_categories() -> List[Category]:
+    table = await get_category_lookup()
+    return [Category.construct(id=id_category, name=name) for id_category, name in table.items()]
 
 async def post_category(category: CategoryOut) -> None:
-    async with get_cursor() as cursor:
-        sql = "INSERT INTO category (name) VALUES (%s)"
-        val = [category.name]
+    async with get_statement("category_create") as statement:
         try:
-            await cursor.execute(sql, val)
+            await statement.execute((category.name,))
         except mysql.connector.Error as exc:
             return "ErrorSQL: the request was unsuccessful..."
-        return None
+        statement.publish("category")
+    return None
 
 async def get_members_category(name_category: str) -> List[GetMembers]:
-    async with get_cursor() as cursor:
-        sql = "SELECT member.* FROM member, member_has_category, category WHERE member.id = member_has_category.id_member " \
-              "AND member_has_category.id_category = category.id AND category.name = %(name)s"
-        await cursor.execute(sql, {"name": name_category})
-        result = await cursor.fetchall()
-        member_record = namedtuple("Member",
-                                   ["id", "username", "lastname", "firstname", "description", "mail", "date_validate",
-                                    "date_deleted", "url_portfolio"])
-        return [map_member_record_to_get_members(member) for member in result
-                if member.date_validate is not None and member.date_deleted is None]
-
-def map_member_record_to_get_members(member_record: Any) -> GetMembers:
-    return GetMembers(id=member_record.id, username=member_record.username, url_portfolio=member_record.url_portfolio)
+    async with get_statement("members_by_category", read_only=True) as statement:
+        await statement.execute((name_category,))
+        result = await statement.fetchall()
+        return GET_MEMBERS.map(statement.description, result)
 
 async def return_id_category_by_name(name: str) -> int:
-    async with get_cursor() as cursor:
-        sql = "SELECT id FROM category WHERE name = %(name)s"
-        try:
-            await cursor.execute(sql, {"name": name})
-            result = await cursor.fetchone()
-            return result[0]
-        except TypeError:
-            return "ErrorSQL : the request was unsuccessful"
+    id_category = await find_lookup_id(get_category_lookup, load_categories, name)
+    if id_category is None:
+        return "ErrorSQL : the request was unsuccessful"
+    return id_category
 
 async def post_add_category_on_member(member: MemberHasCategory) -> None:
-    async with get_cursor() as cursor:
-        sql = """
-        INSERT INTO member_has_category (id_member, id_category) VALUES (%s, %s)
-        ON DUPLICATE KEY UPDATE id_member=id_member
-        """
+    if await find_unknown_ids(get_category_lookup, load_categories, member.id_category):
+        return "ErrorSQL: unknown category"
+    async with get_statement("member_category_add") as statement:
         try:
             values = []
             for cate in member.id_category:
                 values.append([member.id_member, cate])
-            await cursor.executemany(sql, values)
+            await statement.executemany(values)
         except mysql.connector.Error:
             return "ErrorSQL: the request was unsuccessful..."
-        return None
-async def get_network_of_member_by_id(id_member: int) -> List[GetMemberHasNetwork]:
-    async with get_cursor() as cursor:
-        sql = "SELECT network.name, member_has_network.url, member_has_network.id_network FROM network, member_has_network, member WHERE member.id = " \
-              "member_has_network.id_member AND member_has_network.id_network = network.id AND member.id = %(id)s"
-        await cursor.execute(sql, {'id': id_member})
-        result = await cursor.fetchall()
-        network_record = namedtuple("Network", ["name", "url", "id_network"])
-        return [map_network_record_to_get_member_has_network(network) for network in result]
+        statement.publish("member", member.id_member)
+    return None
 
-def map_network_record_to_get_member_has_network(network_record: Any) -> GetMemberHasNetwork:
-    return GetMemberHasNetwork(name=network_record.name, url=network_record.url, id_network=network_record.id_network)
+async def get_network_of_member_by_id(id_member: int) -> List[GetMemberHasNetwork]:
+    async with get_statement("member_networks", read_only=True, id_member=id_member) as statement:
+        await statement.execute((id_member,))
+        result = await statement.fetchall()
+        return GET_MEMBER_HAS_NETWORK.map(statement.description, result)
 
 async def get_category_of_member_by_id(id_member: int) -> List[CategoryOut]:
-    async with get_cursor() as cursor:
-        sql = "SELECT category.name FROM category, member, member_has_category WHERE member.id = " \
-              "member_has_category.id_member AND member_has_category.id_category = category.id AND member.id = %(id)s"
-        await cursor.execute(sql, {'id': id_member})
-        result = await cursor.fetchall()
-        category_record = namedtuple("Category", ["name"])
-        return [map_category_record_to_category_out(category) for category in result]
-
-def map_category_record_to_category_out(category_record: Any) -> CategoryOut:
-    return CategoryOut(name=category_record.name)
+    async with get_statement("member_categories_names", read_only=True, id_member=id_member) as statement:
+        await statement.execute((id_member,))
+        result = await statement.fetchall()
+        return CATEGORY_OUT.map(statement.description, result)
 
 async def get_member_has_category_by_id_member(id_member: int) -> List[MemberHasCategoryOut]:
-    async with get_cursor() as cursor:
-        sql = "SELECT member_has_category.id_member, category.name, member_has_category.id_category FROM " \
-              "member, member_has_category, category WHERE member.id = member_has_category.id_member AND " \
-              "member_has_category.id_category = category.id AND member.id = %(id)s"
-        await cursor.execute(sql, {'id': id_member})
-        result = await cursor.fetchall()
-        category_record = namedtuple("MemberHasCategory", ["id_member","name","id_category"])
-        return [map_category_record_to_member_has_category_out(category) for category in result]
-
-def map_category_record_to_member_has_category_out(category_record: Any) -> MemberHasCategoryOut:
-    return MemberHasCategoryOut(id_member=category_record.id_member, name=category_record.name, id_category=category_record.id_category)
+    async with get_statement("member_categories", read_only=True, id_member=id_member) as statement:
+        await statement.execute((id_member,))
+        result = await statement.fetchall()
+        return MEMBER_HAS_CATEGORY_OUT.map(statement.description, result)
 
 async def get_network() -> List[Network]:
-    async with get_cursor() as cursor:
-        sql = "SELECT * FROM network"
-        await cursor.execute(sql)
-        result = await cursor.fetchall()
-        network_record = namedtuple("Network", ["id", "name"])
-        return [map_network_record_to_network(network) for network in result]
-
-def map_network_record_to_network(network_record: Any) -> Network:
-    return Network(id=network_record.id, name=network_record.name)
+    table = await get_network_lookup()
+    return [Network.construct(id=id_network, name=name) for id_network, name in table.items()]
 
 async def post_network_on_member(member: MemberHasNetwork) -> None:
-    async with get_cursor() as cursor:
-        sql = "INSERT INTO member_has_network (id_member, id_network, url) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE " \
-              "url = VALUES(url)"
+    if await find_unknown_ids(get_network_lookup, load_networks, member.id_network):
+        return "ErrorSQL: unknown network"
+    async with get_statement("member_network_upsert") as statement:
         try:
             values = []
             for url, network in zip(member.url, member.id_network):
                 if url != "" and url is not None:
                     values.append([member.id_member, network, url])
-            await cursor.executemany(sql, values)
+            await statement.executemany(values)
         except mysql.connector.Error as e:
             return "ErrorSQL: the request was unsuccessful..."
-        return None
+        statement.publish("member", member.id_member)
+    return None
 
 async def delete_category_delete_by_member(member: MemberHasCategory) -> None:
-    async with get_cursor() as cursor:
-        sql = "DELETE FROM member_has_category WHERE id_member = %s AND id_category = %s"
+    if await find_unknown_ids(get_category_lookup, load_categories, member.id_category):
+        return "ErrorSQL: unknown category"
+    async with get_statement("member_category_delete") as statement:
         try:
             values = []
             for cate in member.id_category:
                 values.append([member.id_member, cate])
-            await cursor.executemany(sql, values)
+            await statement.executemany(values)
         except mysql.connector.Error:
             return "ErrorSQL: the request was unsuccessful..."
-        return None
+        statement.publish("member", member.id_member)
+    return None
 
 async def delete_network_delete_by_member(member: MemberHasNetworkIn) -> None:
-    async with get_cursor() as cursor:
-        sql = "DELETE FROM member_has_network WHERE id_member = %s AND id_network = %s"
+    if await find_unknown_ids(get_network_lookup, load_networks, member.id_network):
+        return "ErrorSQL : unknown network"
+    async with get_statement("member_network_delete") as statement:
         try:
             values = []
             for network in member.id_network:
                 values.append([member.id_member, network])
-            await cursor.executemany(sql, values)
+            await statement.executemany(values)
         except mysql.connector.Error:
             return "ErrorSQL : the request was unsuccessful..."
-        return None
+        statement.publish("member", member.id_member)
+    return None
 
 async def add_new_network(name: NetworkOut) -> bool:
-    async with get_cursor() as cursor:
-        sql = "INSERT INTO network (name) VALUES (%s)"
-        val = [name.name]
+    async with get_statement("network_create") as statement:
         try:
-            await cursor.execute(sql, val)
+            await statement.execute((name.name,))
         except mysql.connector.Error:
-            await cursor.close()
             return "ErrorSQL: the request was unsuccessful..."
-        return True
+        statement.publish("network")
+    return True
 
 async def add_image_portfolio(file: UploadFile, id_member: int) -> None:
-    async with get_cursor() as cursor:
-        sql = "UPDATE member SET image_portfolio = %s WHERE id = %s"
+    async with get_statement("member_image_update") as statement:
         try:
-            await cursor.execute(sql, (file.file.read(), id_member))
+            await statement.execute((file.file.read(), id_member))
         except mysql.connector.Error:
             return "ErrorSQL : the request was unsuccessful..."
-        await file.file.close()
-        return None
+        file.file.close()
+        statement.publish("member", id_member)
+    return None
 
 async def get_image_by_id_member(id: int) -> bytes:
-    async with get_cursor() as cursor:
+    async with get_statement("member_image", read_only=True, id_member=id) as statement:
         try:
-            sql = "SELECT image_portfolio FROM member WHERE id = %(id)s"
-            await cursor.execute(sql, {'id': id})
-            result = await cursor.fetchone()
-            image = result[0]
-            return image
+            await statement.execute((id,))
+            result = await statement.fetchone()
+            return result[0] if result else None
         except mysql.connector.Error as e:
             print(e)
 
-async def register_new_member(name: str) -> int:
-    async with get_cursor() as cursor:
-        sql = "INSERT INTO member (username) VALUES (%s)"
-        try:
-            await cursor.execute(sql, (name,))
-            id = cursor.lastrowid
-        except mysql.connector.Error as exc:
-            return "ErrorSQL: the request was unsuccessful..."
-        return id
-
-async def get_member_by_username(username: str) -> Optional[MemberIn]:
-    async with get_cursor() as cursor:
-        member_record = namedtuple("Member",
-                                   ["id", "username", "firstname", "lastname", "description", "mail", "url_portfolio",
-                                    "date_validate", "date_deleted"])
-        query = "SELECT {} FROM member WHERE username = %(username)s".format(", ".join(member_record._fields))
-        await cursor.execute(query, {'username': username})
-        result = await cursor.fetchone()
-        if result is None:
-            return None
-        member = member_record._make(result)
-        return map_member_record_to_member_in(member)
-
-async def register_token(access_token: str, refresh_token: str, id_user: int) -> None:
-    async with get_cursor() as cursor:
-        query = "INSERT INTO session (token_session, token_refresh, id_member) VALUES (%s, %s, %s)"
-        val = (access_token, refresh_token, id_user)
-        try:
-            await cursor.execute(query, val)
-        except mysql.connector.Error:
-            return "Error SQL : the request was unsuccessfully..."
-        return None
-
-async def get_session(id_user: int) -> Optional[Session]:
-    async with get_cursor() as cursor:
-        session_record = namedtuple("Session",["access_token","refresh_token","id_member","date_created"])
-        query = "SELECT * FROM session WHERE id_member = %(id_member)s"
+async def insert_member_chunk(rows: List[Tuple[int, MemberImport]], categories: lookups.NameTable,
+                              networks: lookups.NameTable, validate: bool = False) -> Tuple[int, List[ImportRowError]]:
+    """Insert a chunk of imported members with their categories and networks in one transaction, using one
+    multi-row statement per table. Usernames that already exist are reported and skipped. Names are resolved through
+    the lookup tables, so two spellings of one category (or network) give a single row."""
+    errors: List[ImportRowError] = []
+    placeholders = ", ".join(["%s"] * len(rows))
+    try:
+        async with get_cursor() as cursor:
+            await cursor.execute("SELECT username FROM member WHERE username IN ({})".format(placeholders),
+                                 [member.username for _, member in rows])
+            existing = {username.lower() for username, in await cursor.fetchall()}
+            new_rows = []
+            for line, member in rows:
+                if member.username.lower() in existing:
+                    errors.append(ImportRowError(line=line, username=member.username, detail="username already exists"))
+                else:
+                    new_rows.append((line, member))
+            if not new_rows:
+                return 0, errors
+            date_validate = "NOW()" if validate else "NULL"
+            values = []
+            for _, member in new_rows:
+                values += [member.username, member.firstname, member.lastname, member.description, member.mail,
+                           member.url_portfolio]
+            await cursor.execute("INSERT INTO member (username, firstname, lastname, description, mail, url_portfolio, "
+                                 "date_validate) VALUES " +
+                                 ", ".join(["(%s, %s, %s, %s, %s, %s, {})".format(date_validate)] * len(new_rows)), values)
+            await cursor.execute("SELECT id, username FROM member WHERE username IN ({})"
+                                 .format(", ".join(["%s"] * len(new_rows))), [member.username for _, member in new_rows])
+            ids = {username.lower(): id_member for id_member, username in await cursor.fetchall()}
+            category_values = []
+            network_values = []
+            for _, member in new_rows:
+                id_member = ids[member.username.lower()]
+                id_categories = sorted({categories.id_of(name) for name in member.categories})
+                urls = {networks.id_of(name): url for name, url in member.networks.items() if url}
+                category_values += [value for id_category in id_categories for value in (id_member, id_category)]
+                network_values += [value for id_network, url in sorted(urls.items())
+                                   for value in (id_member, id_network, url)]
+            if category_values:
+                await cursor.execute("INSERT INTO member_has_category (id_member, id_category) VALUES " +
+                                     ", ".join(["(%s, %s)"] * (len(category_values) // 2)), category_values)
+            if network_values:
+                await cursor.execute("INSERT INTO member_has_network (id_member, id_network, url) VALUES " +
+                                     ", ".join(["(%s, %s, %s)"] * (len(network_values) // 3)), network_values)
+            if validate:
+                cursor.publish("directory")
+    except mysql.connector.Error as e:
+        return 0, [ImportRowError(line=line, username=member.username, detail="ErrorSQL: {}".format(e.msg))
+                   for line, member in rows]
+    return len(new_rows), errors
+
+async def login_member(username: str, access_token: str, refresh_token: str) -> Optional[SessionRecord]:
+    async with get_cursor() as cursor:
+        params = {"username": username, "access_token": access_token, "refresh_token": refresh_token,
+                  "minutes": SESSION_MINUTES}
         try:
-            await cursor.execute(query, {'id_member': id_user})
-            result = await cursor.fetchone()
-            if not result:
-                return None
-            else:
-                session = session_record._make(result)
-                return session
+            rows = (await cursor.execute_multi(LOGIN_QUERY, params))[-1]
         except mysql.connector.Error:
             return None
+        if not rows:
+            return None
+        session = SessionRecord._make(rows[0])
+        cursor.publish("session", session.id_member)
+    return session
 
 async def delete_session(id_user: int) -> None:
-    async with get_cursor() as cursor:
-        query = "DELETE FROM session WHERE id_member = %(id_member)s"
+    async with get_statement("session_delete") as statement:
         try:
-            await cursor.execute(query, {"id_member": id_user})
+            await statement.execute((id_user,))
         except mysql.connector.Error:
             return "Error SQL"
-        return None
+        statement.publish("session", id_user)
+    return None
 
 async def verif_session(session: Session) -> Optional[bool]:
-    async with get_cursor() as cursor:
-        session_record = namedtuple("Session", ["access_token", "refresh_token", "id_member","date_created"])
-        query = "SELECT * FROM session WHERE id_member = %(id_member)s"
+    async with get_statement("session_by_member") as statement:
         try:
-            await cursor.execute(query, {'id_member': session["user_id"]})
-            result = await cursor.fetchone()
+            await statement.execute((session["user_id"],))
+            result = await statement.fetchone()
             if not result:
                 return None
             else:
-                session_verif = session_record._make(result)
-                print(session_verif)
+                session_verif = SessionRecord._make(result)
                 if session_verif.access_token == session["access_token"] and session_verif.refresh_token == session["refresh_token"]:
-                    temps_date = timedelta(minutes=60)
+                    temps_date = timedelta(minutes=SESSION_MINUTES)
                     if session_verif.date_created + temps_date > datetime.now():
                         return True
                     else:
@@ -349,11 +561,10 @@ async def verif_session(session: Session) -> Optional[bool]:
             return None
 
 async def is_admin(id_user: int) -> bool:
-    async with get_cursor() as cursor:
-        query = "SELECT is_admin FROM member WHERE id = %(id)s"
+    async with get_statement("member_is_admin") as statement:
         try:
-            await cursor.execute(query, {"id": id_user})
-            result = await cursor.fetchone()
+            await statement.execute((id_user,))
+            result = await statement.fetchone()
             if result and result[0] == 1:
                 return True
             else:
@@ -361,83 +572,194 @@ async def is_admin(id_user: int) -> bool:
         except mysql.connector.Error:
             return False
 
-async def delete_table_member_has_category(name: str) -> None:
-    async with get_cursor() as cursor:
-        sql = "DELETE FROM member_has_category WHERE id_category = (" \
-              "SELECT id FROM category WHERE name = %(name)s)"
+async def delete_table_member_has_category(id_category: int) -> None:
+    async with get_statement("member_category_delete_by_category") as statement:
         try:
-            await cursor.execute(sql, {"name": name})
+            await statement.execute((id_category,))
         except mysql.connector.Error:
             return "ErrorSQL : ..."
         return None
 
 async def delete_category(name: str) -> None:
-    async with get_cursor() as cursor:
-        await delete_table_member_has_category(name)
-        sql = "DELETE FROM category WHERE name = %(name)s"
+    id_category = await find_lookup_id(get_category_lookup, load_categories, name)
+    if id_category is None:
+        return "ErrorSQL : unknown category"
+    await delete_table_member_has_category(id_category)
+    async with get_statement("category_delete") as statement:
         try:
-            await cursor.execute(sql, {"name": name})
+            await statement.execute((id_category,))
         except mysql.connector.Error:
             return "ErrorSQL : the request was unsuccessful..."
-        return None
+        statement.publish("category")
+    return None
 
-async def delete_table_member_has_network(name: str) -> None:
-    async with get_cursor() as cursor:
-        sql = "DELETE FROM member_has_network WHERE id_network = (" \
-              "SELECT id FROM network WHERE name = %(name)s)"
+async def delete_table_member_has_network(id_network: int) -> None:
+    async with get_statement("member_network_delete_by_network") as statement:
         try:
-            await cursor.execute(sql, {"name": name})
+            await statement.execute((id_network,))
         except mysql.connector.Error:
             return "ErrorSQL : ..."
         return None
 
 async def delete_network(name: str) -> None:
-    async with get_cursor() as cursor:
-        await delete_table_member_has_network(name)
-        sql = "DELETE FROM network WHERE name = %(name)s"
+    id_network = await find_lookup_id(get_network_lookup, load_networks, name)
+    if id_network is None:
+        return "ErrorSQL : unknown network"
+    await delete_table_member_has_network(id_network)
+    async with get_statement("network_delete") as statement:
         try:
-            await cursor.execute(sql, {"name": name})
+            await statement.execute((id_network,))
         except mysql.connector.Error:
             return "ErrorSQL : the request was unsuccessful..."
-        return None
+        statement.publish("network")
+    return None
 
 async def get_all_member_admin() -> List[MemberOut]:
-    async with get_cursor() as cursor:
-        await cursor.execute("SELECT id, username, firstname, lastname, description, mail, url_portfolio, date_validate, "
-                             "date_deleted FROM member")
-        column_names = [column[0] for column in cursor.description]
-        MemberTuple = namedtuple("Member", column_names)
-        result = await cursor.fetchall()
-        return [map_member_tuple_to_member_out(member) for member in result]
-
-def map_member_tuple_to_member_out(member: Any) -> MemberOut:
-    return MemberOut(id=member.id, username=member.username, firstname=member.firstname, lastname=member.lastname,
-                      description=member.description, mail=member.mail, url_portfolio=member.url_portfolio,
-                      date_activated=member.date_validate, date_deleted=member.date_deleted)
+    async with get_statement("member_all_admin") as statement:
+        await statement.execute()
+        result = await statement.fetchall()
+        return MEMBER_OUT.map(statement.description, result)
 
 async def validate_member(id_member: int) -> None:
-    async with get_cursor() as cursor:
-        sql = "UPDATE member SET date_validate = NOW() WHERE id = %(id)s"
+    async with get_statement("member_validate") as statement:
         try:
-            await cursor.execute(sql, {"id": id_member})
+            await statement.execute((id_member,))
         except mysql.connector.Error:
             return "ErrorSQL: the request was unsuccessful..."
-        return None
+        statement.publish("member", id_member)
+    return None
 
 async def ban_member(id_member: int) -> None:
-    async with get_cursor() as cursor:
-        sql = "UPDATE member SET date_deleted = NOW() WHERE id = %(id)s"
+    async with get_statement("member_ban") as statement:
         try:
-            await cursor.execute(sql, {"id": id_member})
+            await statement.execute((id_member,))
         except mysql.connector.Error:
             return "ErrorSQL: the request was unsuccessful..."
-        return None
+        statement.publish("member", id_member)
+    return None
 
 async def unban_member(id_member: int) -> None:
-    async with get_cursor() as cursor:
-        sql = "UPDATE member SET date_deleted = null WHERE id = %(id)s"
+    async with get_statement("member_unban") as statement:
         try:
-            await cursor.execute(sql, {"id": id_member})
+            await statement.execute((id_member,))
         except mysql.connector.Error:
             return "ErrorSQL: the request was unsuccessful..."
-        return None
+        statement.publish("member", id_member)
+    return None
+
+async def load_article_types() -> None:
+    lookups.article_types.invalidate()
+    async with get_statement("article_type_all") as statement:
+        await statement.execute()
+        result = await statement.fetchall()
+    lookups.article_types.load(result)
+
+async def get_article_type_lookup() -> lookups.NameTable:
+    if not lookups.article_types.loaded:
+        await load_article_types()
+    return lookups.article_types
+
+async def get_article_types() -> List[ArticleType]:
+    table = await get_article_type_lookup()
+    return [ArticleType.construct(id=id_type, name=name) for id_type, name in table.items()]
+
+async def post_article_type(article_type: ArticleTypeOut) -> None:
+    async with get_statement("article_type_create") as statement:
+        try:
+            await statement.execute((article_type.name,))
+        except mysql.connector.Error:
+            return "ErrorSQL: the request was unsuccessful..."
+        statement.publish("article_type")
+    return None
+
+async def get_article_by_id(id_article: int) -> Optional[Article]:
+    async with get_statement("article_by_id") as statement:
+        await statement.execute((id_article,))
+        result = await statement.fetchone()
+        return ARTICLE.map_one(statement.description, result)
+
+async def get_article_feed(id_type: Optional[int], id_member: Optional[int], before: Optional[Tuple[datetime, int]],
+                           limit: int) -> List[ArticleSummary]:
+    date_published, id_article = before or FEED_START
+    cursor = (date_published, date_published, id_article, limit)
+    if id_type is not None and id_member is not None:
+        name, params = "article_feed_by_type_member", (id_member, id_type) + cursor
+    elif id_type is not None:
+        name, params = "article_feed_by_type", (id_type,) + cursor
+    elif id_member is not None:
+        name, params = "article_feed_by_member", (id_member,) + cursor
+    else:
+        name, params = "article_feed", cursor
+    async with get_statement(name, read_only=True) as statement:
+        await statement.execute(params)
+        result = await statement.fetchall()
+        return ARTICLE_SUMMARY.map(statement.description, result)
+
+async def create_article(article: ArticleIn, id_member: int) -> int:
+    if await find_unknown_ids(get_article_type_lookup, load_article_types, [article.id_type]):
+        return "ErrorSQL: unknown article type"
+    async with get_statement("article_create") as statement:
+        try:
+            await statement.execute((article.id_type, id_member, article.title, article.content))
+        except mysql.connector.Error:
+            return "ErrorSQL: the request was unsuccessful..."
+        id = statement.lastrowid
+        statement.publish("article", id)
+    return id
+
+async def update_article(article: ArticleUpdate) -> None:
+    if await find_unknown_ids(get_article_type_lookup, load_article_types, [article.id_type]):
+        return "ErrorSQL: unknown article type"
+    async with get_statement("article_update") as statement:
+        try:
+            await statement.execute((article.id_type, article.title, article.content, article.id))
+        except mysql.connector.Error:
+            return "ErrorSQL: the request was unsuccessful..."
+        statement.publish("article", article.id)
+    return None
+
+async def delete_article(id_article: int) -> None:
+    async with get_statement("article_delete") as statement:
+        try:
+            await statement.execute((id_article,))
+        except mysql.connector.Error:
+            return "ErrorSQL: the request was unsuccessful..."
+        statement.publish("article", id_article)
+    return None
+
+async def flush_article_views(counts: Dict[int, int]) -> None:
+    """Add the buffered view counts of many articles with a single UPDATE."""
+    values = []
+    for id_article, views in counts.items():
+        values += [id_article, views]
+    async with get_cursor() as cursor:
+        await cursor.execute("UPDATE article SET views = views + CASE id {} END WHERE id IN ({})".format(
+            " ".join(["WHEN %s THEN %s"] * len(counts)), ", ".join(["%s"] * len(counts))), values + list(counts))
+
+async def flush_member_activity(counts: Dict[Tuple[int, str], int]) -> None:
+    """Add the buffered profile/image views of many members with a single multi-row upsert. IGNORE skips the ids of
+    members deleted (or never created) since the view, which would otherwise fail the whole batch on every flush."""
+    members: Dict[int, List[int]] = {}
+    for (id_member, kind), amount in counts.items():
+        member = members.setdefault(id_member, [0, 0])
+        member[0 if kind == PROFILE_VIEW else 1] += amount
+    values = []
+    for id_member, (profile_views, image_views) in members.items():
+        values += [id_member, profile_views, image_views]
+    async with get_cursor() as cursor:
+        await cursor.execute("INSERT IGNORE INTO member_stats (id_member, profile_views, image_views) VALUES " +
+                             ", ".join(["(%s, %s, %s)"] * len(members)) +
+                             " ON DUPLICATE KEY UPDATE profile_views = profile_views + VALUES(profile_views), "
+                             "image_views = image_views + VALUES(image_views)", values)
+    versions.bump("member_stats")
+
+async def get_members_by_popularity() -> List[MemberWithCategory]:
+    """Directory members ordered by popularity (read from the indexed column), members without views last. Read from
+    the primary like every cache-filling load: a lagging replica would be cached under the new member_stats version."""
+    members = await get_members()
+    async with get_statement("member_popularity") as statement:
+        await statement.execute()
+        result = await statement.fetchall()
+    ranked = [directory.members[id_member] for id_member, in result if id_member in directory.members]
+    ranked_ids = {member.id_member for member in ranked}
+    return ranked + [member for member in members if member.id_member not in ranked_ids]
@@ -1,9 +1,81 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from .routers import router_github, router_member, router_category, router_network, router_session, router_admin
+from .lib.middleware import CompressionMiddleware, ConditionalGetMiddleware, RateLimitMiddleware
+from . import settings
+from .auth.auth import get_token_user_id
+from .lib.activity import count_not_modified_view, member_activity
+from .lib.articles import article_views
+from .lib.events import changes
+from .lib.limits import Overloaded, SharedBackend, limiter
+from .lib.pools import PoolNotReady, pools
+from .lib.sql import take_rate_limit_token, load_lookups, expire_caches
+from .routers import router_github, router_member, router_category, router_network, router_session, router_admin, \
+    router_health, router_article
+
+POOL_WARMUP_RETRY_SECONDS = 5
+UNLIMITED_PATHS = {"/docs", "/redoc", "/openapi.json", "/health", "/ready"}
+COUNTERS = [article_views, member_activity]
+
+if settings.RATE_LIMIT_BACKEND == "mysql":
+    limiter.use(SharedBackend(take_rate_limit_token))
+
+
+async def warm_pool():
+    """Open the connection pool and load the lookup tables in the background so the server listens even while the DB
+    is unavailable."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, pools.open)
+            await load_lookups()
+            return
+        except Exception as e:
+            print(f"Connection pool warm-up failed, retrying in {POOL_WARMUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(POOL_WARMUP_RETRY_SECONDS)
+
+
+async def monitor_replicas():
+    loop = asyncio.get_running_loop()
+    while True:
+        await loop.run_in_executor(None, pools.probe_replicas)
+        await asyncio.sleep(settings.REPLICA_CHECK_INTERVAL)
+
 
-app = FastAPI()
+async def expire_caches_periodically():
+    while True:
+        await asyncio.sleep(settings.CACHE_MAX_AGE)
+        try:
+            await expire_caches()
+        except Exception as e:
+            print(f"Cache expiry failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [asyncio.create_task(warm_pool())]
+    for counter in COUNTERS:
+        tasks.append(asyncio.create_task(counter.run(settings.COUNTER_FLUSH_INTERVAL)))
+    if pools.replicas:
+        tasks.append(asyncio.create_task(monitor_replicas()))
+    if settings.EVENT_TRANSPORT == "outbox":
+        tasks.append(asyncio.create_task(changes.run(settings.EVENT_POLL_INTERVAL)))
+    if settings.CACHE_MAX_AGE:
+        tasks.append(asyncio.create_task(expire_caches_periodically()))
+    yield
+    # uvicorn only gets here once the requests in flight are done (or cancelled after --timeout-graceful-shutdown)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for counter in COUNTERS:
+        await counter.flush()
+    pools.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 ALLOWED_ORIGINS = [
     "http://localhost.tiangolo.com",
@@ -18,7 +90,21 @@ ALLOWED_ORIGINS = [
 
 ALLOWED_METHODS = ["*"]
 ALLOWED_HEADERS = ["*"]
+COMPRESSION_MINIMUM_SIZE = 500
 
+def rate_limit_keys(request: Request):
+    # A rate of 0 disables a bucket, e.g. the IP one behind a proxy whose forwarded headers are not trusted.
+    rate, burst = settings.RATE_LIMIT_IP
+    if rate and request.client is not None:
+        yield "ip:" + request.client.host, rate, burst
+    # The member bucket is keyed on the signed access token, never on the token_user cookie which anyone can set.
+    rate, burst = settings.RATE_LIMIT_MEMBER
+    id_member = get_token_user_id(request) if rate else None
+    if id_member is not None:
+        yield "member:%d" % id_member, rate, burst
+
+
+app.add_middleware(RateLimitMiddleware, limiter=limiter, keys=rate_limit_keys, exempt_paths=UNLIMITED_PATHS)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
@@ -26,8 +112,11 @@ app.add_middleware(
     allow_methods=ALLOWED_METHODS,
     allow_headers=ALLOWED_HEADERS,
 )
+app.add_middleware(ConditionalGetMiddleware, on_not_modified=count_not_modified_view)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
 
-routers = [router_github.router, router_member.router, router_category.router, router_network.router, router_session.router, router_admin.router]
+routers = [router_github.router, router_member.router, router_category.router, router_network.router, router_session.router, router_admin.router,
+           router_health.router, router_article.router]
 for router in routers:
     app.include_router(router)
 
@@ -35,6 +124,15 @@ for router in routers:
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(status_code=503, content={"detail": "Server overloaded"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(PoolNotReady)
+async def pool_not_ready_handler(request: Request, exc: PoolNotReady):
+    return JSONResponse(status_code=503, content={"detail": "Database not ready"},
+                        headers={"Retry-After": str(POOL_WARMUP_RETRY_SECONDS)})
+
 @app.middleware("http")
 async def http_middleware(request: Request, call_next):
     try:
@@ -4,3 +4,5 @@ from .member_has_category import MemberWithCategory, MemberHasCategoryIn, Member
 from .member_has_network import MemberHasNetwork, GetMemberHasNetwork, MemberHasNetworkIn
 from .network import *
 from .session import Session, SessionCookie
+from .imports import MemberImport, ImportRowError, ImportReport
+from .articles import ArticleTypeOut, ArticleType, ArticleIn, ArticleUpdate, Article, ArticleSummary, ArticleFeed
@@ -0,0 +1,42 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class ArticleTypeOut(BaseModel):
+    name: str
+
+
+class ArticleType(ArticleTypeOut):
+    id: int
+
+
+class ArticleIn(BaseModel):
+    id_type: int
+    title: str
+    content: str
+
+
+class ArticleUpdate(ArticleIn):
+    id: int
+
+
+class Article(ArticleUpdate):
+    id_member: int
+    date_published: datetime
+    date_updated: Optional[datetime] = None
+
+
+class ArticleSummary(BaseModel):
+    id: int
+    id_type: int
+    id_member: int
+    title: str
+    date_published: datetime
+    views: int
+
+
+class ArticleFeed(BaseModel):
+    items: List[ArticleSummary]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,25 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class MemberImport(BaseModel):
+    username: str
+    firstname: Optional[str]
+    lastname: Optional[str]
+    description: Optional[str]
+    mail: Optional[str]
+    url_portfolio: Optional[str]
+    categories: List[str] = []
+    networks: Dict[str, str] = {}
+
+
+class ImportRowError(BaseModel):
+    line: int
+    username: Optional[str]
+    detail: str
+
+
+class ImportReport(BaseModel):
+    created: int = 0
+    errors: List[ImportRowError] = []
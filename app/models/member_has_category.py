@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -22,5 +22,5 @@ class MemberHasCategoryIn(BaseModel):
 class MemberWithCategory(BaseModel):
     id_member: int
     username: str
-    url_portfolio: str
-    category_name: str
+    url_portfolio: Optional[str]
+    category_name: List[str] = []
@@ -4,3 +4,5 @@ from .router_category import *
 from .router_network import *
 from .router_admin import *
 from .router_session import *
+from .router_health import *
+from .router_article import *
@@ -1,11 +1,23 @@
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, UploadFile
 from starlette.responses import Response
 
-from app.lib.sql import *
-from app.models import *
-from app.auth.auth import *
+from app.lib import lookups
+from app.lib.activity import member_activity
+from app.lib.articles import article_views
+from app.lib.cache import article_cache, response_cache, versions
+from app.lib.directory import directory
+from app.lib.events import changes
+from app.lib.health import database_probe
+from app.lib.importer import IMPORT_FORMATS, import_members
+from app.lib.limits import admission, limiter
+from app.lib.pools import pools
+from app.lib.queries import queries
+from app.lib.sql import get_all_member_admin, post_category, add_new_network, delete_category, delete_network, \
+    validate_member, ban_member, unban_member, post_article_type, create_article, update_article, delete_article
+from app.models import MemberOut, CategoryOut, NetworkOut, ImportReport, ArticleTypeOut, ArticleIn, ArticleUpdate
+from app.auth.auth import get_current_user, get_is_admin
 
 router = APIRouter(
     prefix="/admin",
@@ -18,11 +30,47 @@ async def api_is_admin(is_admin_user: bool = Depends(get_is_admin)):
     return Response(status_code=200)
 
 
+@router.get("/statements")
+async def api_get_statements_stats(is_admin_user: bool = Depends(get_is_admin)):
+    return queries.stats()
+
+
+@router.get("/diagnostics")
+async def api_get_diagnostics(is_admin_user: bool = Depends(get_is_admin)):
+    return {
+        "pools": pools.stats(),
+        "database": database_probe.stats(),
+        "admission": admission.stats(),
+        "rate_limit": {"backend": type(limiter.backend).__name__, "limited": limiter.limited},
+        "cache": {
+            "versions": versions.versions,
+            "versions_floor": versions.floor,
+            "responses": {key: entry.version for key, entry in response_cache.entries.items()},
+            "articles": article_cache.stats(),
+            "directory": {"loaded": directory.loaded, "version": directory.version, "members": len(directory.members)},
+            "lookups": {name: {"loaded": table.loaded, "version": table.version, "size": len(table.names)}
+                        for name, table in (("category", lookups.categories), ("network", lookups.networks),
+                                            ("article_type", lookups.article_types))},
+        },
+        "counters": {counter.name: {"pending": counter.pending(), "flushed": counter.flushed}
+                     for counter in (article_views, member_activity)},
+        "events": {"transport": type(changes.transport).__name__, "cursor": getattr(changes.transport, "cursor", None),
+                   "gaps": len(getattr(changes.transport, "gaps", ()))},
+    }
+
+
 @router.get("/member", response_model=List[MemberOut])
 async def api_get_member_all(is_admin_user: bool = Depends(get_is_admin)):
     return await get_all_member_admin()
 
 
+@router.post("/member/import", response_model=ImportReport)
+async def api_import_members(file: UploadFile, validate: bool = False, is_admin_user: bool = Depends(get_is_admin)):
+    if not file.filename or not file.filename.lower().endswith(IMPORT_FORMATS):
+        return Response(status_code=415)
+    return await import_members(file.file, file.filename, validate)
+
+
 @router.post("/category")
 async def api_post_category(category: CategoryOut, is_admin_user: bool = Depends(get_is_admin)):
     result = await post_category(category)
@@ -71,3 +119,32 @@ async def api_ban_member(id_member: str, current_user: dict = Depends(get_curren
     if await unban_member(int(id_member)) is not None:
         return Response(status_code=400)
     return Response(status_code=200)
+
+
+@router.post("/article_type")
+async def api_post_article_type(article_type: ArticleTypeOut, is_admin_user: bool = Depends(get_is_admin)):
+    if await post_article_type(article_type) is not None:
+        return Response(status_code=400)
+    return Response(status_code=201)
+
+
+@router.post("/article")
+async def api_post_article(article: ArticleIn, current_user: dict = Depends(get_current_user), is_admin_user: bool = Depends(get_is_admin)):
+    id_article = await create_article(article, current_user["user_id"])
+    if not isinstance(id_article, int):
+        return Response(status_code=400)
+    return {"id": id_article}
+
+
+@router.patch("/article")
+async def api_patch_article(article: ArticleUpdate, current_user: dict = Depends(get_current_user), is_admin_user: bool = Depends(get_is_admin)):
+    if await update_article(article) is not None:
+        return Response(status_code=400)
+    return Response(status_code=200)
+
+
+@router.delete("/article")
+async def api_delete_article(id_article: int, current_user: dict = Depends(get_current_user), is_admin_user: bool = Depends(get_is_admin)):
+    if await delete_article(id_article) is not None:
+        return Response(status_code=400)
+    return Response(status_code=200)
@@ -0,0 +1,62 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Request, Response
+
+from app.lib.articles import FEED_DEFAULT_LIMIT, FEED_MAX_LIMIT, article_views, decode_feed_cursor, \
+    encode_feed_cursor, render_article_html
+from app.lib.cache import article_cache, encoded_response, versions
+from app.lib.sql import get_article_by_id, get_article_feed, get_article_types
+from app.models import Article, ArticleFeed, ArticleType
+
+router = APIRouter(
+    prefix="/article",
+    tags=["article"]
+)
+
+
+@router.get("/", response_model=ArticleFeed)
+async def api_get_article_feed(id_type: Optional[int] = None, id_member: Optional[int] = None,
+                               cursor: Optional[str] = None, limit: int = FEED_DEFAULT_LIMIT):
+    before = None
+    if cursor is not None:
+        before = decode_feed_cursor(cursor)
+        if before is None:
+            return Response(status_code=400)
+    limit = max(1, min(limit, FEED_MAX_LIMIT))
+    items = await get_article_feed(id_type, id_member, before, limit)
+    next_cursor = encode_feed_cursor(items[-1]) if len(items) == limit else None
+    return ArticleFeed.construct(items=items, next_cursor=next_cursor)
+
+
+@router.get("/types", response_model=List[ArticleType])
+async def api_get_article_types():
+    return await get_article_types()
+
+
+@router.get("/{id:int}", response_model=Article)
+async def api_get_article(id: int, request: Request):
+    key = "article:%d" % id
+    version = versions.get(key)
+    entry = article_cache.get(key, version)
+    if entry is None:
+        article = await get_article_by_id(id)
+        if article is None:
+            return Response(status_code=404)
+        entry = article_cache.put_body(key, version, article, article.json().encode())
+    article_views.add(id)
+    return encoded_response(entry, request)
+
+
+@router.get("/{id:int}/html")
+async def api_get_article_html(id: int, request: Request):
+    key = "article_html:%d" % id
+    version = versions.get("article:%d" % id)
+    entry = article_cache.get(key, version)
+    if entry is None:
+        article = await get_article_by_id(id)
+        if article is None:
+            return Response(status_code=404)
+        entry = article_cache.put_body(key, version, article, render_article_html(article).encode(),
+                                       media_type="text/html; charset=utf-8")
+    article_views.add(id)
+    return encoded_response(entry, request)
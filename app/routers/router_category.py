@@ -1,9 +1,11 @@
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 
-from app.lib.sql import *
-from app.models import *
+from app.lib.cache import cached_list, encoded_response, versions
+
+from app.lib.sql import get_categories
+from app.models import Category
 
 router = APIRouter(
     prefix="/category",
@@ -12,5 +14,5 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[Category])
-async def api_get_categories():
-    return await get_categories()
+async def api_get_categories(request: Request):
+    return encoded_response(await cached_list("categories", versions.get("categories"), get_categories), request)
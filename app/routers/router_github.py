@@ -1,18 +1,15 @@
-import json
 import secrets
+from functools import lru_cache
 
 import jwt
 from fastapi import APIRouter, Response
 from starlette.responses import RedirectResponse
 
-from fastapi_sso.sso.github import GithubSSO
-from app.lib.sql import *
+from app.lib.sql import login_member
 from starlette.requests import Request
 
 from app.settings import GITHUB
 
-from datetime import datetime, timedelta
-
 from app import settings
 
 router = APIRouter(
@@ -22,38 +19,29 @@ router = APIRouter(
 
 SECRET_KEY = settings.SECRET_KEY
 
-github_sso = GithubSSO(GITHUB["client_id"], GITHUB["client_secret"], f"{GITHUB['callback_uri']}/github/callback")
+
+@lru_cache(maxsize=None)
+def get_github_sso():
+    """Build the GitHub SSO client on the first login instead of at import time"""
+    from fastapi_sso.sso.github import GithubSSO
+    return GithubSSO(GITHUB["client_id"], GITHUB["client_secret"], f"{GITHUB['callback_uri']}/github/callback")
 
 
 @router.get("/login")
 async def github_login():
     """Generate login url and redirect"""
-    return await github_sso.get_login_redirect()
+    return await get_github_sso().get_login_redirect()
 
 
 @router.get("/callback")
 async def github_callback(request: Request) -> Response:
     """Process login response from Google and return user info"""
-    user = await github_sso.verify_and_process(request)
-    member = await get_member_by_username(user.display_name)
-    if member is None:
-        member_id = await register_new_member(user.display_name)
-    else:
-        member_id = member.id
-    access_token = secrets.token_hex(16)
-    refresh_token = secrets.token_hex(16)
-    session = await get_session(member_id)
-    token_data = {"user_id": member_id, "access_token": access_token, "refresh_token": refresh_token}
-    #verifiez si une session n'existe pas
-    if session is not None:
-        temps_date = timedelta(minutes=60)
-        if session.date_created + temps_date > datetime.now():
-            token_data = {"user_id": session.id_member, "access_token": session.access_token, "refresh_token": session.refresh_token}
-        else:
-            await delete_session(member_id)
-            await register_token(access_token, refresh_token, member_id)
-    else:
-        await register_token(access_token, refresh_token, member_id)
+    user = await get_github_sso().verify_and_process(request)
+    session = await login_member(user.display_name, secrets.token_hex(16), secrets.token_hex(16))
+    if session is None:
+        return Response(status_code=500)
+    member_id = session.id_member
+    token_data = {"user_id": member_id, "access_token": session.access_token, "refresh_token": session.refresh_token}
     token = jwt.encode(token_data, SECRET_KEY, algorithm=settings.ALGORITHM)
     token_bis = member_id
     # Redirigez l'utilisateur vers la page de profil
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.lib.health import database_probe
+from app.lib.pools import pools
+
+router = APIRouter(
+    tags=["health"]
+)
+
+
+@router.get("/health")
+async def api_health():
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def api_ready():
+    if not pools.ready():
+        pools.open_in_background()
+        return JSONResponse(status_code=503, content={"status": "warming"})
+    if not await database_probe.ok():
+        return JSONResponse(status_code=503, content={"status": "database unavailable"})
+    return {"status": "ready"}
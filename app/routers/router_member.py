@@ -1,13 +1,20 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Depends, UploadFile
 from starlette.responses import Response
 
+from app.lib.activity import count_image_view, count_profile_view
+from app.lib.cache import cached_list, encoded_response, versions
+from app.lib.directory import directory
 from app.lib.function import verifIsPngAndJpeg
-from app.lib.sql import *
-from app.models import *
+from app.lib.sql import get_members, get_members_by_popularity, get_member_by_id, patch_member_update, add_image_portfolio, \
+    get_image_by_id_member, post_add_category_on_member, get_category_of_member_by_id, \
+    get_member_has_category_by_id_member, delete_category_delete_by_member, get_members_category, \
+    get_network_of_member_by_id, post_network_on_member, delete_network_delete_by_member
+from app.models import MemberWithCategory, MemberIn, MemberOut, MemberHasCategory, CategoryOut, GetMemberHasNetwork, \
+    MemberHasNetwork, MemberHasNetworkIn
 from app.models.member_has_category import MemberHasCategoryOut
-from app.auth.auth import *
+from app.auth.auth import get_current_user
 
 router = APIRouter(
     prefix="/member",
@@ -16,8 +23,13 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[MemberWithCategory])
-async def api_get_members():
-    return await get_members()
+async def api_get_members(request: Request, sort: Optional[str] = None):
+    # Loading the directory moves its version, so it is loaded before the version keying the cached body is read.
+    await get_members()
+    if sort == "popularity":
+        version = (directory.version, versions.get("member_stats"))
+        return encoded_response(await cached_list("members_popularity", version, get_members_by_popularity), request)
+    return encoded_response(await cached_list("members", directory.version, get_members), request)
 
 
 @router.get("/{id:int}", response_model=MemberIn)
@@ -25,6 +37,7 @@ async def api_get_member_by_id(id: int):
     member = await get_member_by_id(id)
     if member is None:
         return Response(status_code=404)
+    count_profile_view(id)
     return member
 
 
@@ -52,7 +65,10 @@ async def api_add_image_portfolio(file: UploadFile, id_member: int, current_user
 
 @router.get("/image_portfolio_by_id")
 async def api_get_image_portfolio_by_id_member(id_member: int):
-    return Response(content=await get_image_by_id_member(id_member), media_type="image/jpg")
+    image = await get_image_by_id_member(id_member)
+    if image is not None:
+        count_image_view(id_member)
+    return Response(content=image, media_type="image/jpg")
 
 
 @router.post("/category")
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Response, Depends
+from fastapi import APIRouter, Response, Depends, Request
 
 from app.auth import get_current_user, get_is_admin
-from app.lib.sql import *
+from app.lib.cache import cached_list, encoded_response, versions
+from app.lib.sql import get_network
+from app.models import Network
 from typing import List
 
 router = APIRouter(
@@ -11,5 +13,5 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[Network])
-async def api_get_network():
-    return await get_network()
+async def api_get_network(request: Request):
+    return encoded_response(await cached_list("networks", versions.get("networks"), get_network), request)
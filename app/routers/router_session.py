@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+import jwt
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import RedirectResponse
 
-from app.lib.sql import delete_session
-from app.auth.auth import *
+from app.lib.sql import delete_session, verif_session
+from app.auth.auth import get_current_user
 
 from app.settings import SECRET_KEY, ALGORITHM
 
@@ -8,9 +8,42 @@ PASSWORD = os.environ.get("MYSQL_PASSWORD")
 HOST = os.environ.get("MYSQL_HOST", default="localhost")
 DATABASE = os.environ.get("MYSQL_DATABASE")
 PORT = os.environ.get("MYSQL_PORT", default=3306)
+POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", default=3))
+# Read replicas as a comma separated "host:port" list, reads fall back to the primary when none is healthy
+REPLICAS = [replica.strip() for replica in os.environ.get("MYSQL_REPLICAS", default="").split(",") if replica.strip()]
+REPLICA_MAX_LAG = int(os.environ.get("MYSQL_REPLICA_MAX_LAG", default=5))
+REPLICA_CHECK_INTERVAL = float(os.environ.get("MYSQL_REPLICA_CHECK_INTERVAL", default=2))
+STICKY_SECONDS = int(os.environ.get("MYSQL_STICKY_SECONDS", default=10))
 ALGORITHM = os.environ.get("ALGORITHM")
 SECRET_KEY = os.environ.get("SECRET_KEY")
 
+# Database connections checked out at once, further queries wait up to ADMISSION_QUEUE_TIMEOUT seconds then the
+# request gets a 503. Above MYSQL_POOL_SIZE only when replicas serve part of the reads.
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", default=POOL_SIZE))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", default=0.5))
+# Token buckets per client IP and per member: refill rate in requests per second (0 disables the bucket) and burst
+# size. Behind a reverse proxy the client IP is only known when uvicorn trusts it, see FORWARDED_ALLOW_IPS.
+RATE_LIMIT_IP = (float(os.environ.get("RATE_LIMIT_IP_RATE", default=10)), int(os.environ.get("RATE_LIMIT_IP_BURST", default=40)))
+RATE_LIMIT_MEMBER = (float(os.environ.get("RATE_LIMIT_MEMBER_RATE", default=5)),
+                     int(os.environ.get("RATE_LIMIT_MEMBER_BURST", default=20)))
+# "memory" keeps the buckets in each worker, "mysql" shares them through the rate_limit table
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", default="memory")
+
+# Seconds between two flushes of the buffered counters (article views, member activity)
+COUNTER_FLUSH_INTERVAL = float(os.environ.get("COUNTER_FLUSH_INTERVAL", default=5))
+
+# "local" keeps change events inside the worker, "outbox" shares them between workers through the change_event table
+EVENT_TRANSPORT = os.environ.get("EVENT_TRANSPORT", default="local")
+EVENT_POLL_INTERVAL = float(os.environ.get("EVENT_POLL_INTERVAL", default=1))
+# Seconds after which every in-process cache is dropped and reloaded, a safety net for change events that never
+# arrived (0 disables it)
+CACHE_MAX_AGE = float(os.environ.get("CACHE_MAX_AGE", default=300))
+# Encoded article bodies kept in memory (JSON and HTML count separately), least recently read dropped first
+ARTICLE_CACHE_SIZE = int(os.environ.get("ARTICLE_CACHE_SIZE", default=1000))
+
+# Seconds a database probe result is reused by /ready
+READY_PROBE_TTL = float(os.environ.get("READY_PROBE_TTL", default=2))
+
 GITHUB = {
     "client_id": os.environ.get("GITHUB_CLIENT_ID"),
     "client_secret": os.environ.get("GITHUB_CLIENT_SECRET"),
@@ -4,6 +4,34 @@
 
 -- --------------------------------------------------------
 
+--
+-- Structure de la table `article`
+--
+
+CREATE TABLE `article` (
+  `id` int(11) NOT NULL,
+  `id_type` int(11) NOT NULL,
+  `id_member` int(11) NOT NULL,
+  `title` varchar(255) NOT NULL,
+  `content` mediumtext NOT NULL,
+  `date_published` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `date_updated` datetime DEFAULT NULL,
+  `views` int(11) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+-- --------------------------------------------------------
+
+--
+-- Structure de la table `article_type`
+--
+
+CREATE TABLE `article_type` (
+  `id` int(11) NOT NULL,
+  `name` varchar(50) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+-- --------------------------------------------------------
+
 --
 -- Structure de la table `category`
 --
@@ -30,7 +58,8 @@ CREATE TABLE `member` (
   `date_deleted` datetime DEFAULT NULL,
   `url_portfolio` varchar(320) DEFAULT NULL,
   `is_admin` int(1) default 0,
-  `image_portfolio` longblob
+  `image_portfolio` longblob,
+  `version` int(11) NOT NULL DEFAULT 0
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 
 -- --------------------------------------------------------
@@ -58,6 +87,19 @@ CREATE TABLE `member_has_network` (
 
 -- --------------------------------------------------------
 
+--
+-- Structure de la table `member_stats`
+--
+
+CREATE TABLE `member_stats` (
+  `id_member` int(11) NOT NULL,
+  `profile_views` int(11) NOT NULL DEFAULT 0,
+  `image_views` int(11) NOT NULL DEFAULT 0,
+  `popularity` int(11) GENERATED ALWAYS AS (`profile_views` + `image_views`) STORED
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+-- --------------------------------------------------------
+
 --
 -- Structure de la table `network`
 --
@@ -80,21 +122,68 @@ CREATE TABLE `session` (
   `date_created` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 
+-- --------------------------------------------------------
+
+--
+-- Structure de la table `change_event`
+--
+
+CREATE TABLE `change_event` (
+  `id` bigint(20) NOT NULL,
+  `topic` varchar(30) NOT NULL,
+  `event_key` int(11) DEFAULT NULL,
+  `origin` varchar(32) NOT NULL,
+  `date_created` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+-- --------------------------------------------------------
+
+--
+-- Structure de la table `rate_limit`
+--
+
+CREATE TABLE `rate_limit` (
+  `bucket` varchar(100) NOT NULL,
+  `tokens` double NOT NULL,
+  `updated` double NOT NULL,
+  `allowed` tinyint(1) NOT NULL DEFAULT 1
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
 --
 -- Index pour les tables déchargées
 --
 
+--
+-- Index pour la table `article`
+-- (one index per feed variant so that keyset pagination stays a range scan)
+--
+ALTER TABLE `article`
+  ADD PRIMARY KEY (`id`),
+  ADD KEY `feed` (`date_published`,`id`),
+  ADD KEY `feed_type` (`id_type`,`date_published`,`id`),
+  ADD KEY `feed_member` (`id_member`,`date_published`,`id`),
+  ADD KEY `feed_member_type` (`id_member`,`id_type`,`date_published`,`id`);
+
+--
+-- Index pour la table `article_type`
+--
+ALTER TABLE `article_type`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `unique_article_type_name` (`name`);
+
 --
 -- Index pour la table `category`
 --
 ALTER TABLE `category`
-  ADD PRIMARY KEY (`id`);
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `unique_category_name` (`name`);
 
 --
 -- Index pour la table `member`
 --
 ALTER TABLE `member`
-  ADD PRIMARY KEY (`id`);
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `unique_member_username` (`username`);
 
 --
 -- Index pour la table `member_has_category`
@@ -112,22 +201,55 @@ ALTER TABLE `member_has_network`
   ADD KEY `id_member` (`id_member`),
   ADD KEY `id_network` (`id_network`);
 
+--
+-- Index pour la table `member_stats`
+--
+ALTER TABLE `member_stats`
+  ADD PRIMARY KEY (`id_member`),
+  ADD KEY `popularity` (`popularity`,`id_member`);
+
 --
 -- Index pour la table `network`
 --
 ALTER TABLE `network`
-  ADD PRIMARY KEY (`Id`);
+  ADD PRIMARY KEY (`Id`),
+  ADD UNIQUE KEY `unique_network_name` (`name`);
 
 --
 -- Index pour la table `session`
 --
 ALTER TABLE `session`
-  ADD KEY `id_member` (`id_member`);
+  ADD PRIMARY KEY (`id_member`);
+
+--
+-- Index pour la table `change_event`
+--
+ALTER TABLE `change_event`
+  ADD PRIMARY KEY (`id`),
+  ADD KEY `date_created` (`date_created`);
+
+--
+-- Index pour la table `rate_limit`
+--
+ALTER TABLE `rate_limit`
+  ADD PRIMARY KEY (`bucket`);
 
 --
 -- AUTO_INCREMENT pour les tables déchargées
 --
 
+--
+-- AUTO_INCREMENT pour la table `article`
+--
+ALTER TABLE `article`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
+--
+-- AUTO_INCREMENT pour la table `article_type`
+--
+ALTER TABLE `article_type`
+  MODIFY `id` int(11) NOT NULL AUTO_INCREMENT;
+
 --
 -- AUTO_INCREMENT pour la table `category`
 --
@@ -146,10 +268,23 @@ ALTER TABLE `member`
 ALTER TABLE `network`
   MODIFY `Id` int(11) NOT NULL AUTO_INCREMENT;
 
+--
+-- AUTO_INCREMENT pour la table `change_event`
+--
+ALTER TABLE `change_event`
+  MODIFY `id` bigint(20) NOT NULL AUTO_INCREMENT;
+
 --
 -- Contraintes pour les tables déchargées
 --
 
+--
+-- Contraintes pour la table `article`
+--
+ALTER TABLE `article`
+  ADD CONSTRAINT `article_ibfk_1` FOREIGN KEY (`id_type`) REFERENCES `article_type` (`id`),
+  ADD CONSTRAINT `article_ibfk_2` FOREIGN KEY (`id_member`) REFERENCES `member` (`id`);
+
 --
 -- Contraintes pour la table `member_has_category`
 --
@@ -164,6 +299,12 @@ ALTER TABLE `member_has_network`
   ADD CONSTRAINT `member_has_network_ibfk_1` FOREIGN KEY (`id_member`) REFERENCES `member` (`id`),
   ADD CONSTRAINT `member_has_network_ibfk_2` FOREIGN KEY (`id_network`) REFERENCES `network` (`Id`);
 
+--
+-- Contraintes pour la table `member_stats`
+--
+ALTER TABLE `member_stats`
+  ADD CONSTRAINT `member_stats_ibfk_1` FOREIGN KEY (`id_member`) REFERENCES `member` (`id`);
+
 --
 -- Contraintes pour la table `session`
 --
@@ -0,0 +1,26 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.lib import activity, middleware
+from app.lib.cache import article_cache, versions
+from app.lib.middleware import ConditionalGetMiddleware
+
+
+def test_views_answered_with_304_are_counted(monkeypatch):
+    counts = []
+    monkeypatch.setattr(activity, "count_profile_view", lambda id_member: counts.append(("profile", id_member)))
+    monkeypatch.setattr(activity, "count_image_view", lambda id_member: counts.append(("image", id_member)))
+    monkeypatch.setattr(activity.article_views, "add", lambda id_article: counts.append(("article", id_article)))
+
+    async def member_etag(request):
+        return 'W/"m1"' if middleware.member_of(request) is not None else None
+
+    monkeypatch.setattr(middleware, "member_etag", member_etag)
+    article_cache.put_body("article_html:3", versions.get("article:3"), None, b"<p>3</p>")
+    app = FastAPI()
+    app.add_middleware(ConditionalGetMiddleware, on_not_modified=activity.count_not_modified_view)
+    client = TestClient(app)
+    for url in ("/member/7", "/member/image_portfolio_by_id?id_member=7", "/article/3/html", "/member/category/7"):
+        response = client.get(url, headers={"If-None-Match": "*"})
+        assert response.status_code == 304
+    assert counts == [("profile", 7), ("image", 7), ("article", 3)]
@@ -0,0 +1,11 @@
+from app.lib.cache import ResponseCache
+
+
+def test_article_cache_drops_the_least_recently_read_entry():
+    cache = ResponseCache(max_entries=2)
+    cache.put_body("article:1", 1, None, b"one")
+    cache.put_body("article:2", 1, None, b"two")
+    assert cache.get("article:1", 1) is not None
+    cache.put_body("article:3", 1, None, b"three")
+    assert list(cache.entries) == ["article:1", "article:3"]
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "evicted": 1}
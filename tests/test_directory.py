@@ -0,0 +1,122 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.lib import sql
+from app.lib.cache import response_cache
+from app.lib.directory import DirectorySnapshot, directory
+from app.lib.limits import Overloaded
+from app.main import app
+from app.models import MemberWithCategory
+
+
+class FakeDatabase:
+    """The directory rows; a read of the whole directory can be held open to let changes land meanwhile."""
+
+    def __init__(self, ids):
+        self.ids = set(ids)
+        self.hold = asyncio.Event()
+        self.hold.set()
+        self.reading = asyncio.Event()
+
+    @asynccontextmanager
+    async def get_statement(self, name, **kwargs):
+        statement = SimpleNamespace(rows=[])
+
+        async def execute(params=()):
+            if name == "directory":
+                statement.rows = sorted(self.ids)
+                self.reading.set()
+                await self.hold.wait()
+            else:
+                statement.rows = [id_member for id_member in params if id_member in self.ids]
+
+        async def fetchall():
+            return statement.rows
+
+        statement.execute, statement.fetchall = execute, fetchall
+        yield statement
+
+
+def use(monkeypatch, database):
+    directory = DirectorySnapshot()
+    monkeypatch.setattr(sql, "directory", directory)
+    monkeypatch.setattr(sql, "get_statement", database.get_statement)
+    monkeypatch.setattr(sql, "map_directory_records_to_members_with_category",
+                        lambda rows: [SimpleNamespace(id_member=id_member) for id_member in rows])
+    return directory
+
+
+def test_a_member_banned_during_the_load_is_removed(monkeypatch):
+    async def scenario():
+        database = FakeDatabase([1, 2])
+        directory = use(monkeypatch, database)
+        database.hold.clear()
+        load = asyncio.create_task(sql.get_members())
+        await database.reading.wait()
+        database.ids.discard(2)
+        refresh = asyncio.create_task(sql.refresh_directory_member(2))
+        await asyncio.sleep(0)
+        database.hold.set()
+        await asyncio.gather(load, refresh)
+        return directory
+
+    assert list(asyncio.run(scenario()).members) == [1]
+
+
+def test_an_invalidation_during_the_load_reads_the_rows_again(monkeypatch):
+    async def scenario():
+        database = FakeDatabase([1])
+        directory = use(monkeypatch, database)
+        database.hold.clear()
+        load = asyncio.create_task(sql.get_members())
+        await database.reading.wait()
+        database.ids.add(3)
+        directory.invalidate()
+        database.hold.set()
+        await load
+        return directory
+
+    directory = asyncio.run(scenario())
+    assert directory.loaded and list(directory.members) == [1, 3]
+
+
+def test_a_shed_refresh_drops_the_snapshot(monkeypatch):
+    @asynccontextmanager
+    async def overloaded(name, **kwargs):
+        raise Overloaded("No database connection available")
+        yield
+
+    directory = DirectorySnapshot()
+    directory.load([])
+    monkeypatch.setattr(sql, "directory", directory)
+    monkeypatch.setattr(sql, "get_statement", overloaded)
+    with pytest.raises(Overloaded):
+        asyncio.run(sql.on_member_changed(7))
+    assert not directory.loaded
+
+
+def test_the_directory_body_is_cached_under_the_loaded_version(monkeypatch):
+    database = FakeDatabase([1, 2])
+    reads = []
+    get_statement = database.get_statement
+
+    def counting_get_statement(name, **kwargs):
+        reads.append(name)
+        return get_statement(name, **kwargs)
+
+    monkeypatch.setattr(sql, "get_statement", counting_get_statement)
+    monkeypatch.setattr(sql, "map_directory_records_to_members_with_category",
+                        lambda rows: [MemberWithCategory(id_member=id_member, username="member%d" % id_member)
+                                      for id_member in rows])
+    directory.invalidate()
+    client = TestClient(app)
+    first = client.get("/member/")
+    assert first.status_code == 200
+    assert response_cache.get("members", directory.version).etag == first.headers["ETag"]
+    assert client.get("/member/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert client.get("/member/").content == first.content
+    assert reads == ["directory"]
@@ -0,0 +1,51 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.lib import lookups, middleware
+from app.lib.cache import response_cache, versions
+from app.lib.middleware import ConditionalGetMiddleware
+from app.main import app
+
+
+def test_list_etags_survive_the_cache_expiry(monkeypatch):
+    table = lookups.NameTable()
+    table.load([(1, "Python")])
+    monkeypatch.setattr(lookups, "categories", table)
+    client = TestClient(app)
+    etag = client.get("/category/").headers["ETag"]
+    # What another worker, a restart or the periodic expiry looks like: nothing cached, other versions.
+    versions.expire()
+    response_cache.clear()
+    response = client.get("/category/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert client.get("/category/", headers={"If-None-Match": etag}).status_code == 304
+    table.load([(1, "Python"), (2, "Rust")])
+    versions.bump("categories")
+    assert client.get("/category/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_member_etags_follow_the_stored_version(monkeypatch):
+    stored = {7: 3}
+
+    async def get_member_version(id_member):
+        return stored.get(id_member)
+
+    monkeypatch.setattr(middleware, "get_member_version", get_member_version)
+    for table in (lookups.categories, lookups.networks):
+        monkeypatch.setattr(table, "loaded", True)
+    member_app = FastAPI()
+    member_app.add_middleware(ConditionalGetMiddleware)
+
+    @member_app.get("/member/{id}")
+    async def member(id: int):
+        return {"id": id}
+
+    client = TestClient(member_app)
+    etag = client.get("/member/7").headers["ETag"]
+    assert client.get("/member/7", headers={"If-None-Match": etag}).status_code == 304
+    stored[7] = 4
+    response = client.get("/member/7", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "ETag" not in client.get("/member/8").headers
@@ -0,0 +1,52 @@
+import asyncio
+
+from app.lib.events import OutboxTransport
+
+
+class Outbox:
+    """The change_event table as seen by a poller: only committed rows are visible."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def commit(self, id_event, topic, key=None, origin="other"):
+        self.rows[id_event] = (id_event, topic, key, origin)
+
+    async def fetch(self, after):
+        if after is None:
+            return [(max(self.rows, default=0), None, None, None)]
+        return [self.rows[id_event] for id_event in sorted(self.rows) if id_event > after]
+
+    async def fetch_range(self, first, last):
+        return [self.rows[id_event] for id_event in sorted(self.rows) if first <= id_event <= last]
+
+    async def prune(self):
+        pass
+
+
+def poll(transport):
+    return [(event.topic, event.key) for event in asyncio.run(transport.poll())]
+
+
+def test_event_committed_after_a_higher_id_is_delivered():
+    outbox = Outbox()
+    transport = OutboxTransport(outbox.fetch, outbox.fetch_range, outbox.prune)
+    outbox.commit(9, "member", 1)
+    assert poll(transport) == []
+    outbox.commit(11, "member", 3)
+    assert poll(transport) == [("member", 3)]
+    assert transport.gaps.keys() == {10}
+    outbox.commit(10, "category")
+    assert poll(transport) == [("category", None)]
+    assert transport.gaps == {}
+    assert poll(transport) == []
+
+
+def test_gaps_of_rolled_back_inserts_expire():
+    outbox = Outbox()
+    transport = OutboxTransport(outbox.fetch, outbox.fetch_range, outbox.prune, gap_timeout=0)
+    poll(transport)
+    outbox.commit(3, "network")
+    assert poll(transport) == [("network", None)]
+    assert poll(transport) == []
+    assert transport.gaps == {}
@@ -0,0 +1,69 @@
+import asyncio
+import io
+
+from app.lib import importer, lookups, sql
+from app.lib.pools import pools
+
+
+class ImportCursor:
+    lastrowid = None
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, operation, params=()):
+        self.connection.executed.append((operation, list(params)))
+        if operation.startswith("SELECT id, username"):
+            self.rows = [(10 + index, username) for index, username in enumerate(params)]
+        else:
+            self.rows = []
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class ImportConnection:
+    def __init__(self):
+        self.executed = []
+
+    def cursor(self, **kwargs):
+        return ImportCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def get_connection(self):
+        return self
+
+
+def test_names_are_resolved_like_the_collation(monkeypatch):
+    categories, networks = lookups.NameTable(), lookups.NameTable()
+    categories.load([(1, "Python"), (2, "Café")])
+    networks.load([(3, "GitHub")])
+    monkeypatch.setattr(lookups, "categories", categories)
+    monkeypatch.setattr(lookups, "networks", networks)
+    monkeypatch.setattr(lookups, "MISS_RELOAD_INTERVAL", 60)
+    connection = ImportConnection()
+    monkeypatch.setattr(pools, "primary", lambda: connection)
+    upload = io.BytesIO("username,categories,network:github\n"
+                        "ada,Python|python|cafe,https://github.com/ada\n"
+                        "bob,Rust,\n".encode())
+
+    report = asyncio.run(importer.import_members(upload, "members.csv"))
+
+    assert report.created == 1
+    assert [(error.username, error.detail) for error in report.errors] == \
+        [("bob", "unknown category or network: Rust")]
+    inserts = {operation.split(" (")[0]: params for operation, params in connection.executed}
+    assert inserts["INSERT INTO member_has_category"] == [10, 1, 10, 2]
+    assert inserts["INSERT INTO member_has_network"] == [10, 3, "https://github.com/ada"]
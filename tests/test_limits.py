@@ -0,0 +1,59 @@
+import asyncio
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app import settings
+from app.auth import auth
+from app.lib.limits import AdmissionController, MemoryBackend, Overloaded, limiter
+from app.main import app, rate_limit_keys
+
+
+def request_with_cookies(cookie: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [(b"cookie", cookie.encode())],
+                    "client": ("203.0.113.7", 4000)})
+
+
+def test_member_bucket_needs_a_signed_token(monkeypatch):
+    monkeypatch.setattr(auth, "SECRET_KEY", "secret")
+    monkeypatch.setattr(auth, "ALGORITHM", "HS256")
+    forged = jwt.encode({"user_id": 42}, "not the secret", algorithm="HS256")
+    keys = [key for key, rate, burst in rate_limit_keys(request_with_cookies("token_user=42; access_token=" + forged))]
+    assert keys == ["ip:203.0.113.7"]
+    signed = jwt.encode({"user_id": 42}, "secret", algorithm="HS256")
+    keys = [key for key, rate, burst in rate_limit_keys(request_with_cookies("token_user=7; access_token=" + signed))]
+    assert keys == ["ip:203.0.113.7", "member:42"]
+
+
+def test_admission_sheds_checkouts_beyond_the_cap():
+    async def scenario():
+        admission = AdmissionController(1, 0.01)
+        async with admission.slot():
+            with pytest.raises(Overloaded):
+                async with admission.slot():
+                    pass
+        async with admission.slot():
+            assert admission.in_flight == 1
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert (admission.in_flight, admission.shed) == (0, 1)
+
+
+def test_429_carries_the_cors_headers(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_IP", (1, 1))
+    monkeypatch.setattr(limiter, "backend", MemoryBackend())
+    client = TestClient(app)
+    headers = {"Origin": "http://localhost"}
+    assert client.get("/nowhere", headers=headers).status_code == 404
+    response = client.get("/nowhere", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert response.headers["access-control-allow-origin"] == "http://localhost"
+
+
+def test_a_rate_of_zero_disables_the_ip_bucket(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_IP", (0, 40))
+    assert list(rate_limit_keys(request_with_cookies(""))) == []
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app.lib import lookups, sql
+from app.lib.cache import versions
+from app.lib.limits import Overloaded
+
+
+def test_names_match_the_way_the_collation_does():
+    table = lookups.NameTable()
+    table.load([(1, "Python"), (2, "Café")])
+    assert table.id_of("python") == 1
+    assert table.id_of("PYTHON ") == 1
+    assert table.id_of("cafe") == 2
+    assert table.id_of("rust") is None
+
+
+def test_a_miss_reloads_the_table_once(monkeypatch):
+    table = lookups.NameTable()
+    table.load([(1, "Python")])
+    loads = []
+
+    async def get_lookup():
+        return table
+
+    async def load():
+        loads.append(True)
+        table.load([(1, "Python"), (2, "Rust")])
+
+    monkeypatch.setattr(lookups, "MISS_RELOAD_INTERVAL", 0)
+    assert asyncio.run(sql.find_lookup_id(get_lookup, load, "rust")) == 2
+    assert asyncio.run(sql.find_unknown_ids(get_lookup, load, [1, 2])) == []
+    assert len(loads) == 1
+    monkeypatch.setattr(lookups, "MISS_RELOAD_INTERVAL", 60)
+    assert asyncio.run(sql.find_unknown_ids(get_lookup, load, [3])) == [3]
+    assert len(loads) == 1
+
+
+def test_a_shed_category_reload_still_moves_the_version(monkeypatch):
+    async def overloaded():
+        raise Overloaded("No database connection available")
+
+    table = lookups.NameTable()
+    table.load([(1, "Python")])
+    monkeypatch.setattr(lookups, "categories", table)
+    monkeypatch.setattr(sql, "load_categories", overloaded)
+    version = versions.get("categories")
+    with pytest.raises(Overloaded):
+        asyncio.run(sql.on_category_changed(None))
+    assert versions.get("categories") == version + 1
+    assert not table.loaded
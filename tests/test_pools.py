@@ -0,0 +1,88 @@
+import asyncio
+
+import mysql.connector
+from mysql.connector.errors import InterfaceError, PoolError
+
+from app.lib import sql
+from app.lib.pools import PoolRouter, Replica
+
+
+class StatusConnection:
+    def cursor(self, **kwargs):
+        return self
+
+    def execute(self, operation):
+        pass
+
+    def fetchone(self):
+        return {"Seconds_Behind_Master": 0}
+
+    def close(self):
+        pass
+
+
+class FailingPool:
+    def __init__(self, error):
+        self.error = error
+
+    def get_connection(self):
+        raise self.error
+
+
+class PrimaryConnection(StatusConnection):
+    connection_id = 1
+
+    def rollback(self):
+        pass
+
+
+class PrimaryPool:
+    def __init__(self):
+        self.checkouts = 0
+
+    def get_connection(self):
+        self.checkouts += 1
+        return PrimaryConnection()
+
+
+def test_probe_does_not_borrow_from_the_busy_replica_pool(monkeypatch):
+    replica = Replica("replica_0", "replica", 3306)
+    replica.pool = FailingPool(PoolError("Failed getting connection; pool exhausted"))
+    monkeypatch.setattr(mysql.connector, "connect", lambda **kwargs: StatusConnection())
+    replica.probe()
+    assert replica.healthy and replica.lag == 0
+
+
+def router_with_replica(monkeypatch, error):
+    router = PoolRouter()
+    replica = Replica("replica_0", "replica", 3306)
+    replica.pool, replica.healthy = FailingPool(error), True
+    router.replicas = [replica]
+    router._round_robin = iter([replica] * 10)
+    router._primary = PrimaryPool()
+    monkeypatch.setattr(sql, "pools", router)
+    return router, replica
+
+
+def test_reads_fall_back_to_the_primary_when_the_replica_is_down(monkeypatch):
+    router, replica = router_with_replica(monkeypatch, InterfaceError("Can't connect to MySQL server"))
+
+    async def read():
+        async with sql.get_statement("ping", commit_on_exit=False, read_only=True):
+            pass
+
+    asyncio.run(read())
+    assert router._primary.checkouts == 1
+    assert not replica.healthy
+
+
+def test_an_exhausted_replica_pool_stays_healthy(monkeypatch):
+    router, replica = router_with_replica(monkeypatch, PoolError("Failed getting connection; pool exhausted"))
+
+    async def read():
+        async with sql.get_statement("ping", commit_on_exit=False, read_only=True):
+            pass
+
+    asyncio.run(read())
+    assert router._primary.checkouts == 1
+    assert replica.healthy
@@ -0,0 +1,161 @@
+import asyncio
+
+import mysql.connector
+import pytest
+
+from app.lib import sql
+from app.lib.events import OutboxTransport, changes
+from app.lib.limits import AdmissionController, Overloaded
+from app.lib.pools import pools
+
+
+class StubCursor:
+    description = None
+    lastrowid = None
+
+    def __init__(self, connection, rows):
+        self.connection = connection
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, operation, params=()):
+        self.executed.append((operation, params))
+        self.connection.log.append(operation)
+
+    def executemany(self, operation, seq_params):
+        for params in seq_params:
+            self.execute(operation, params)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    connection_id = 1
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.cursors = []
+        self.log = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = 0
+
+    def cursor(self, **kwargs):
+        cursor = StubCursor(self, self.rows)
+        self.cursors.append(cursor)
+        return cursor
+
+    def commit(self):
+        self.commits += 1
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed += 1
+
+
+class StubPool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get_connection(self):
+        return self.connection
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    connection = StubConnection([(1,)])
+    monkeypatch.setattr(pools, "primary", lambda: StubPool(connection))
+    return connection
+
+
+def test_get_statement_commits_and_returns_the_connection(connection):
+    asyncio.run(sql.ping_database())
+    assert connection.cursors[0].executed == [("SELECT 1", ())]
+    assert (connection.commits, connection.rollbacks, connection.closed) == (0, 0, 1)
+
+
+def test_get_statement_rolls_back_on_error(connection):
+    async def failing_write():
+        async with sql.get_statement("ping") as statement:
+            await statement.execute()
+            raise mysql.connector.Error("write failed")
+
+    with pytest.raises(mysql.connector.Error):
+        asyncio.run(failing_write())
+    assert (connection.commits, connection.rollbacks, connection.closed) == (0, 1, 1)
+
+
+def test_get_cursor_reads_buffered_rows(connection):
+    async def read():
+        async with sql.get_cursor() as cursor:
+            await cursor.execute("SELECT 1")
+            return await cursor.fetchall()
+
+    assert asyncio.run(read()) == [(1,)]
+    assert (connection.commits, connection.closed) == (1, 1)
+
+
+def test_statements_are_prepared_again_after_a_reconnect(connection):
+    asyncio.run(sql.ping_database())
+    asyncio.run(sql.ping_database())
+    assert len(connection.cursors) == 1
+    connection.connection_id += 1
+    asyncio.run(sql.ping_database())
+    assert len(connection.cursors) == 2
+
+
+def test_change_events_are_written_in_the_transaction_of_the_change(connection, monkeypatch):
+    monkeypatch.setattr(changes, "transport", OutboxTransport(None, None, None))
+    dispatched = []
+
+    async def dispatch(event):
+        dispatched.append((event.topic, event.key, connection.log[-1]))
+
+    monkeypatch.setattr(changes, "dispatch", dispatch)
+    asyncio.run(sql.validate_member(5))
+    update, insert = sql.queries.statements["member_validate"].sql, sql.queries.statements["change_event_insert"].sql
+    bump = sql.queries.statements["member_version_bump"].sql
+    assert connection.log == [update, bump, insert, "COMMIT"]
+    assert dispatched == [("member", 5, "COMMIT")]
+    assert connection.cursors[-1].executed == [(insert, ("member", 5, changes.origin))]
+
+
+def test_no_change_event_when_the_write_fails(connection, monkeypatch):
+    monkeypatch.setattr(changes, "transport", OutboxTransport(None, None, None))
+
+    def failing_execute(self, operation, params=()):
+        raise mysql.connector.Error("write failed")
+
+    monkeypatch.setattr(StubCursor, "execute", failing_execute)
+    assert asyncio.run(sql.validate_member(5)).startswith("ErrorSQL")
+    assert connection.log == ["COMMIT"]
+
+
+def test_ping_database():
+    """Smoke test against the database configured in the environment, skipped when there is none."""
+    try:
+        pools.open()
+    except mysql.connector.Error as e:
+        pytest.skip("no database available: {}".format(e))
+    asyncio.run(sql.ping_database())
+
+
+def test_checkout_takes_an_admission_slot(connection, monkeypatch):
+    monkeypatch.setattr(sql, "admission", AdmissionController(1, 0.01))
+
+    async def scenario():
+        async with sql.get_statement("ping", commit_on_exit=False):
+            with pytest.raises(Overloaded):
+                await sql.ping_database()
+        await sql.ping_database()
+
+    asyncio.run(scenario())
+    assert sql.admission.in_flight == 0
+    assert connection.closed == 2
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+
+import httpx
+
+from app.lib import lookups
+from app.lib import pools as pools_module
+from app.lib.pools import pools
+from app.main import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_BUDGET_SECONDS = 2.0
+# TEST-NET-1 address: nothing answers there, so any connection attempted at import time would hang the import.
+UNREACHABLE_DATABASE = {"MYSQL_HOST": "192.0.2.1", "MYSQL_PORT": "3306"}
+
+
+def test_import_within_budget_without_database():
+    code = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=dict(os.environ, **UNREACHABLE_DATABASE),
+                            capture_output=True, text=True, timeout=30, check=True)
+    assert float(result.stdout.strip().splitlines()[-1]) < STARTUP_BUDGET_SECONDS
+
+
+class StubCursor:
+    description = None
+    lastrowid = None
+
+    def execute(self, operation, params=()):
+        pass
+
+    def fetchall(self):
+        return [(1, "Python")]
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    connection_id = 1
+
+    def cursor(self, **kwargs):
+        return StubCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StubPool:
+    def get_connection(self):
+        return StubConnection()
+
+
+def test_requests_fail_fast_then_open_the_pool_without_lifespan(monkeypatch):
+    # Without the lifespan the warm-up never runs, as on serverless hosts: the first request opens the pool.
+    opened = threading.Event()
+
+    def create_pool(name, host, port):
+        opened.wait(5)
+        return StubPool()
+
+    monkeypatch.setattr(pools_module, "create_pool", create_pool)
+    monkeypatch.setattr(pools, "_primary", None)
+    monkeypatch.setattr(lookups.categories, "loaded", False)
+
+    async def requests():
+        # One event loop for every request, as in a server process; no lifespan events are sent.
+        async with httpx.AsyncClient(app=app, base_url="http://testserver") as client:
+            assert (await client.get("/health")).status_code == 200
+            assert (await client.get("/ready")).status_code == 503
+            response = await client.get("/category/")
+            assert response.status_code == 503
+            assert response.headers["Retry-After"]
+            opened.set()
+            for _ in range(50):
+                response = await client.get("/category/")
+                if response.status_code != 503:
+                    break
+                await asyncio.sleep(0.1)
+            return response
+
+    response = asyncio.run(requests())
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1, "name": "Python"}]